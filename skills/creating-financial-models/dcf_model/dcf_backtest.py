@@ -0,0 +1,215 @@
+"""
+Rolling historical DCF backtest.
+Re-values a company as of every historical date, treating the valuation date
+as a batch dimension. Each date's historical window is a strided view into a
+single loaded history, so no per-date copies or model instances are created.
+"""
+
+import argparse
+import json
+from collections.abc import Iterator
+from typing import Any
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# dcf_model.py からベクトル化カーネルをインポート (同じディレクトリにある前提)
+from dcf_model import calculate_wacc_batch, equity_bridge, evaluate_dcf_batch
+
+HISTORY_FIELDS = ["revenue", "ebitda", "capex", "nwc"]
+WACC_FIELDS = ["risk_free_rate", "beta", "market_premium", "cost_of_debt", "debt_to_equity"]
+
+
+def _per_date(value: Any, n_obs: int, window: int, name: str) -> np.ndarray:
+    """スカラーまたは時系列を、評価日 (window 本目以降) ごとの値のビューに揃える"""
+    array = np.asarray(value, dtype=float)
+    if array.ndim == 0:
+        return np.broadcast_to(array, (n_obs - window + 1,))
+    if array.shape != (n_obs,):
+        raise ValueError(f"{name} must be a scalar or have one value per date ({n_obs})")
+    return array[window - 1 :]
+
+
+def _per_year(value: Any, years: int, default: float, name: str) -> np.ndarray:
+    if value is None:
+        return np.full(years, default)
+    array = np.asarray(value, dtype=float)
+    if array.ndim == 0 or len(array) == 1:
+        return np.full(years, float(array.reshape(-1)[0]))
+    if len(array) < years:
+        raise ValueError(f"{name} needs {years} values, got {len(array)}")
+    return array[:years]
+
+
+def iter_backtest(
+    history: dict[str, Any],
+    window: int,
+    assumptions: dict[str, Any] | None = None,
+    wacc_parameters: dict[str, Any] | None = None,
+    equity_params: dict[str, Any] | None = None,
+    periods_per_year: int = 4,
+    trailing_growth: bool = False,
+    chunk_size: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Stream DCF valuations as of every date with a full historical window.
+
+    Flows in history are expected as annual (e.g. trailing-twelve-month) figures
+    observed at each date. For each valuation date the last window observations
+    drive the projection: the latest revenue is the base, and an omitted
+    EBITDA margin defaults to the window's average margin, as in
+    DCFModel.set_assumptions. WACC and equity inputs may be scalars or series
+    with one value per date.
+
+    Args:
+        history: {"dates", "revenue", "ebitda", "capex", "nwc"} series
+        window: Number of observations per historical window
+        assumptions: dcf_model schema assumptions (revenue_growth/ebitda_margin optional)
+        wacc_parameters: dcf_model schema WACC parameters
+        equity_params: {"net_debt", "shares_outstanding"}; equity outputs are omitted if absent
+        periods_per_year: Observations per year, used to annualize trailing growth
+        trailing_growth: Use the window's annualized revenue CAGR as the growth rate
+        chunk_size: Dates per vectorized pass (defaults to all dates at once)
+
+    Yields:
+        Dicts with "date" and metric arrays for consecutive chunks of dates
+    """
+    assumptions = assumptions or {}
+    wacc_parameters = wacc_parameters or {}
+
+    series = {name: np.asarray(history[name], dtype=float) for name in HISTORY_FIELDS}
+    dates = list(history["dates"])
+    n_obs = len(dates)
+    if any(values.shape != (n_obs,) for values in series.values()):
+        raise ValueError("History series must have one value per date")
+    if window < 1 or window > n_obs:
+        raise ValueError(f"window must be between 1 and {n_obs}")
+    if np.any(series["revenue"] == 0):
+        raise ValueError("Historical revenue must not contain zero")
+
+    years = int(assumptions.get("projection_years", 5))
+    n_dates = n_obs - window + 1
+
+    # 評価日ごとの過去ウィンドウは元データへのストライドビュー (コピーしない)
+    revenue_windows = sliding_window_view(series["revenue"], window)
+    base_revenue = revenue_windows[:, -1]
+
+    if assumptions.get("ebitda_margin") is not None:
+        ebitda_margin = _per_year(assumptions["ebitda_margin"], years, 0.20, "ebitda_margin")
+        ebitda_margin = np.broadcast_to(ebitda_margin, (n_dates, years))
+    else:
+        margin_windows = sliding_window_view(series["ebitda"] / series["revenue"], window)
+        ebitda_margin = np.broadcast_to(margin_windows.mean(axis=1)[:, None], (n_dates, years))
+
+    if trailing_growth:
+        if window < 2:
+            raise ValueError("trailing_growth needs a window of at least 2 observations")
+        ratio = revenue_windows[:, -1] / revenue_windows[:, 0]
+        # 年率換算した CAGR を全予測期間に適用する
+        cagr = ratio ** (periods_per_year / (window - 1)) - 1
+        revenue_growth = np.broadcast_to(cagr[:, None], (n_dates, years))
+    else:
+        revenue_growth = _per_year(assumptions.get("revenue_growth"), years, 0.10, "revenue_growth")
+        revenue_growth = np.broadcast_to(revenue_growth, (n_dates, years))
+
+    capex_percent = _per_year(assumptions.get("capex_percent"), years, 0.05, "capex_percent")
+    nwc_percent = _per_year(assumptions.get("nwc_percent"), years, 0.10, "nwc_percent")
+
+    missing = [name for name in WACC_FIELDS if name not in wacc_parameters]
+    if missing:
+        raise ValueError(f"missing wacc_parameters: {', '.join(missing)}")
+    tax_rate = _per_date(assumptions.get("tax_rate", 0.25), n_obs, window, "tax_rate")
+    wacc = calculate_wacc_batch(
+        *(_per_date(wacc_parameters[name], n_obs, window, name) for name in WACC_FIELDS),
+        tax_rate=tax_rate,
+    )
+
+    terminal_growth = _per_date(assumptions.get("terminal_growth", 0.03), n_obs, window, "terminal_growth")
+    if equity_params is not None:
+        net_debt = _per_date(equity_params["net_debt"], n_obs, window, "net_debt")
+        shares = _per_date(equity_params.get("shares_outstanding", 100), n_obs, window, "shares_outstanding")
+        cash = _per_date(equity_params.get("cash", 0), n_obs, window, "cash")
+
+    # 評価日ごとの入力はすべて先頭次元が評価日のビューなので、チャンクはスライスで切り出す
+    step = chunk_size or n_dates
+    for start in range(0, n_dates, step):
+        stop = min(start + step, n_dates)
+        results = evaluate_dcf_batch(
+            base_revenue=base_revenue[start:stop],
+            revenue_growth=revenue_growth[start:stop],
+            ebitda_margin=ebitda_margin[start:stop],
+            capex_percent=capex_percent,
+            nwc_percent=nwc_percent,
+            years=years,
+            tax_rate=tax_rate[start:stop],
+            wacc=wacc[start:stop],
+            terminal_growth=terminal_growth[start:stop],
+        )
+        chunk = {
+            "date": dates[window - 1 + start : window - 1 + stop],
+            "wacc": wacc[start:stop],
+            "enterprise_value": results["enterprise_value"],
+            "terminal_percent": results["terminal_percent"],
+        }
+        if equity_params is not None:
+            chunk.update(
+                equity_bridge(
+                    results["enterprise_value"],
+                    net_debt[start:stop],
+                    shares[start:stop],
+                    cash[start:stop],
+                )
+            )
+        yield chunk
+
+
+def run_backtest(history: dict[str, Any], window: int, **kwargs: Any) -> dict[str, Any]:
+    """
+    Run the full backtest and return the concatenated time series.
+
+    Args:
+        history: Historical series (see iter_backtest)
+        window: Number of observations per historical window
+        **kwargs: Passed to iter_backtest
+
+    Returns:
+        Dict with "date" list and one array per metric
+    """
+    chunks = list(iter_backtest(history, window, **kwargs))
+    combined = {"date": [date for chunk in chunks for date in chunk["date"]]}
+    for key in chunks[0]:
+        if key != "date":
+            combined[key] = np.concatenate([chunk[key] for chunk in chunks])
+    return combined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling DCF Backtest CLI")
+    parser.add_argument("--input", required=True, help="Backtest input JSON file")
+    parser.add_argument("--window", type=int, default=12, help="Observations per historical window")
+    parser.add_argument("--periods_per_year", type=int, default=4, help="Observations per year")
+    parser.add_argument("--trailing_growth", action="store_true", help="Use trailing revenue CAGR as growth")
+    parser.add_argument("--chunk_size", type=int, default=None, help="Dates per vectorized pass")
+
+    args = parser.parse_args()
+
+    # 入力形式: {"company_name", "history", "assumptions", "wacc_parameters", "equity_params"}
+    with open(args.input, encoding="utf-8") as f:
+        data = json.load(f)
+
+    # 1行1評価日の JSON Lines で逐次出力
+    for chunk in iter_backtest(
+        data["history"],
+        args.window,
+        assumptions=data.get("assumptions"),
+        wacc_parameters=data.get("wacc_parameters"),
+        equity_params=data.get("equity_params"),
+        periods_per_year=args.periods_per_year,
+        trailing_growth=args.trailing_growth,
+        chunk_size=args.chunk_size,
+    ):
+        metrics = [key for key in chunk if key != "date"]
+        for i, date in enumerate(chunk["date"]):
+            record = {"company_name": data.get("company_name"), "date": date}
+            record.update({key: round(float(chunk[key][i]), 4) for key in metrics})
+            print(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,306 @@
+"""
+Concurrent bulk loader for DCF input files.
+Reads and validates many SKILL.md-schema JSON files in parallel and batches
+them into ready-to-value inputs for run_dcf_analysis.
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+# dcf_model.py から run_dcf_analysis をインポート (同じディレクトリにある前提)
+from dcf_model import run_dcf_analysis
+
+REQUIRED_SECTIONS = ["company_name", "assumptions", "wacc_parameters", "equity_params"]
+HISTORICAL_FIELDS = ["years", "revenue", "ebitda", "capex", "nwc"]
+
+
+def _require_numbers(values: Any, field: str) -> list[float]:
+    if not isinstance(values, list) or not values:
+        raise ValueError(f"{field} must be a non-empty list")
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{field} must contain only numbers")
+        # JSON の NaN / Infinity は json.load で通ってしまうため明示的に弾く
+        if not math.isfinite(value):
+            raise ValueError(f"{field} must contain only finite numbers")
+    return [float(value) for value in values]
+
+
+def _require_number(section: dict[str, Any], field: str, prefix: str) -> float:
+    value = section.get(field)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{prefix}.{field} must be a number")
+    if not math.isfinite(value):
+        raise ValueError(f"{prefix}.{field} must be a finite number")
+    return float(value)
+
+
+def parse_dcf_input(data: dict[str, Any]) -> argparse.Namespace:
+    """
+    Validate one SKILL.md-schema input and convert it to run_dcf_analysis args.
+
+    Args:
+        data: Parsed JSON object in the dcf_model input schema
+
+    Returns:
+        Namespace accepted by run_dcf_analysis
+
+    Raises:
+        ValueError: If the input does not match the schema
+    """
+    if not isinstance(data, dict):
+        raise ValueError("input must be a JSON object")
+
+    missing = [section for section in REQUIRED_SECTIONS if section not in data]
+    if missing:
+        raise ValueError(f"missing required fields: {', '.join(missing)}")
+
+    # run_dcf_analysis は過去データの最終年売上を起点に予測するため必須扱い
+    hist = data.get("historical_financials")
+    if not isinstance(hist, dict):
+        raise ValueError("historical_financials is required by run_dcf_analysis")
+    hist_values = {
+        field: _require_numbers(hist.get(field), f"historical_financials.{field}")
+        for field in HISTORICAL_FIELDS
+    }
+    if len({len(values) for values in hist_values.values()}) != 1:
+        raise ValueError("historical_financials lists must have the same length")
+    if any(value == 0 for value in hist_values["revenue"]):
+        raise ValueError("historical_financials.revenue must not contain zero")
+    if any(not value.is_integer() for value in hist_values["years"]):
+        raise ValueError("historical_financials.years must contain only integers")
+
+    assumptions = data["assumptions"]
+    if not isinstance(assumptions, dict):
+        raise ValueError("assumptions must be an object")
+    years = assumptions.get("projection_years", 5)
+    if isinstance(years, bool) or not isinstance(years, int) or years < 1:
+        raise ValueError("assumptions.projection_years must be a positive integer")
+
+    # 1つの値なら全期間一定、複数なら projection_years と同じ長さが必要
+    per_year = {}
+    for field in ["revenue_growth", "ebitda_margin", "capex_percent", "nwc_percent"]:
+        if field not in assumptions:
+            if field in ("revenue_growth", "ebitda_margin"):
+                raise ValueError(f"assumptions.{field} is required")
+            per_year[field] = None
+            continue
+        values = _require_numbers(assumptions[field], f"assumptions.{field}")
+        if len(values) not in (1, years):
+            raise ValueError(f"assumptions.{field} must have 1 or {years} values")
+        per_year[field] = values
+
+    # 省略時は run_dcf_analysis の CLI と同じ既定値を使う
+    scalars = {"tax_rate": 0.25, "terminal_growth": 0.03}
+    for field in scalars:
+        if field in assumptions:
+            scalars[field] = _require_number(assumptions, field, "assumptions")
+
+    wacc_params = data["wacc_parameters"]
+    if not isinstance(wacc_params, dict):
+        raise ValueError("wacc_parameters must be an object")
+    equity_params = data["equity_params"]
+    if not isinstance(equity_params, dict):
+        raise ValueError("equity_params must be an object")
+
+    return argparse.Namespace(
+        company=str(data["company_name"]),
+        years=years,
+        hist_years=[int(year) for year in hist_values["years"]],
+        hist_revenue=hist_values["revenue"],
+        hist_ebitda=hist_values["ebitda"],
+        hist_capex=hist_values["capex"],
+        hist_nwc=hist_values["nwc"],
+        growth=per_year["revenue_growth"],
+        margin=per_year["ebitda_margin"],
+        capex_percent=per_year["capex_percent"],
+        nwc_percent=per_year["nwc_percent"],
+        tax_rate=scalars["tax_rate"],
+        terminal_growth=scalars["terminal_growth"],
+        rf=_require_number(wacc_params, "risk_free_rate", "wacc_parameters"),
+        beta=_require_number(wacc_params, "beta", "wacc_parameters"),
+        erp=_require_number(wacc_params, "market_premium", "wacc_parameters"),
+        cost_debt=_require_number(wacc_params, "cost_of_debt", "wacc_parameters"),
+        debt_equity=_require_number(wacc_params, "debt_to_equity", "wacc_parameters"),
+        net_debt=_require_number(equity_params, "net_debt", "equity_params"),
+        shares=_require_number(equity_params, "shares_outstanding", "equity_params"),
+    )
+
+
+def load_dcf_input(path: str) -> argparse.Namespace:
+    """
+    Read, parse and validate a single input file.
+
+    Args:
+        path: Path to a JSON input file
+
+    Returns:
+        Namespace accepted by run_dcf_analysis
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return parse_dcf_input(data)
+
+
+def expand_input_paths(items: Iterable[str]) -> list[str]:
+    """
+    Expand CLI inputs into JSON file paths.
+
+    Args:
+        items: Files or directories; a directory contributes its *.json files
+            in sorted order
+
+    Returns:
+        Input file paths
+    """
+    paths = []
+    for item in items:
+        if os.path.isdir(item):
+            paths.extend(
+                os.path.join(item, name) for name in sorted(os.listdir(item)) if name.endswith(".json")
+            )
+        else:
+            paths.append(item)
+    return paths
+
+
+def _load_entry(path: str) -> dict[str, Any]:
+    # ワーカースレッド内で例外を結果に変換し、1ファイルの失敗で全体を止めない
+    try:
+        return {"path": path, "args": load_dcf_input(path), "error": None}
+    except (OSError, ValueError) as e:
+        return {"path": path, "args": None, "error": f"{type(e).__name__}: {e}"}
+
+
+def iter_input_batches(
+    paths: Iterable[str],
+    batch_size: int = 64,
+    max_workers: int = 8,
+    max_pending: int | None = None,
+    strict: bool = False,
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Load input files concurrently and yield them in batches.
+
+    At most max_pending files are read ahead of the consumer, so memory stays
+    bounded while loading overlaps with whatever the caller does per batch.
+    Batches preserve the order of paths.
+
+    Args:
+        paths: Input file paths
+        batch_size: Number of entries per yielded batch
+        max_workers: Number of loader threads
+        max_pending: Read-ahead limit (defaults to 4 batches)
+        strict: Raise on the first invalid file instead of reporting it
+
+    Yields:
+        Lists of {"path", "args", "error"} entries; args is None on error
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    if max_pending is None:
+        max_pending = batch_size * 4
+    max_pending = max(max_pending, batch_size)
+
+    path_iter = iter(paths)
+    pending: deque[Future] = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def fill() -> None:
+            while len(pending) < max_pending:
+                path = next(path_iter, None)
+                if path is None:
+                    return
+                pending.append(executor.submit(_load_entry, os.fspath(path)))
+
+        fill()
+        batch = []
+        while pending:
+            entry = pending.popleft().result()
+            if strict and entry["error"] is not None:
+                for future in pending:
+                    future.cancel()
+                raise ValueError(f"{entry['path']}: {entry['error']}")
+            batch.append(entry)
+            # 消費した分だけ先読みを補充する (back-pressure)
+            fill()
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def run_bulk_dcf_analysis(
+    paths: Iterable[str],
+    batch_size: int = 64,
+    max_workers: int = 8,
+    max_pending: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Value every input file, overlapping file loading with valuation.
+
+    Args:
+        paths: Input file paths
+        batch_size: Number of files per batch
+        max_workers: Number of loader threads
+        max_pending: Read-ahead limit
+
+    Yields:
+        {"path", "result"} for valued inputs or {"path", "error"} on failure
+    """
+    for batch in iter_input_batches(paths, batch_size, max_workers, max_pending):
+        for entry in batch:
+            if entry["error"] is not None:
+                yield {"path": entry["path"], "error": entry["error"]}
+                continue
+            try:
+                result = run_dcf_analysis(entry["args"])
+            except (ValueError, ZeroDivisionError, IndexError) as e:
+                yield {"path": entry["path"], "error": f"{type(e).__name__}: {e}"}
+                continue
+            yield {"path": entry["path"], "result": result}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk DCF Valuation CLI")
+    parser.add_argument("inputs", nargs="+", help="Input JSON files or directories")
+    parser.add_argument("--batch_size", type=int, default=64, help="Files per batch")
+    parser.add_argument("--workers", type=int, default=8, help="Loader threads")
+    parser.add_argument("--max_pending", type=int, default=None, help="Read-ahead limit")
+    parser.add_argument("--checkpoint_dir", default=None, help="Directory for periodic checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Skip files completed in the checkpoint")
+    parser.add_argument("--overwrite", action="store_true", help="Discard an existing checkpoint and start over")
+    parser.add_argument("--checkpoint_every", type=int, default=100, help="Files per checkpoint")
+
+    args = parser.parse_args()
+
+    # ディレクトリ指定時は直下の *.json を対象にする
+    input_paths = expand_input_paths(args.inputs)
+
+    if args.checkpoint_dir:
+        from dcf_checkpoint import run_portfolio_with_checkpoints
+
+        records = run_portfolio_with_checkpoints(
+            input_paths,
+            args.checkpoint_dir,
+            resume=args.resume,
+            overwrite=args.overwrite,
+            checkpoint_every=args.checkpoint_every,
+            batch_size=args.batch_size,
+            max_workers=args.workers,
+            max_pending=args.max_pending,
+        )
+    else:
+        records = run_bulk_dcf_analysis(input_paths, args.batch_size, args.workers, args.max_pending)
+
+    # 1行1社の JSON Lines で出力
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,498 @@
+"""
+Checkpoint and resume for long-running portfolio valuations and simulations.
+Completed work units and partial aggregates (running moments, histogram
+percentile sketches) are written atomically to a local directory, so a killed
+or preempted job restarts from its last checkpoint instead of from scratch.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+import numpy as np
+
+# dcf_model.py と同じディレクトリにある前提
+from dcf_bulk_loader import iter_input_batches
+from dcf_model import DCFModel, run_dcf_analysis
+from dcf_parallel import iter_task_results, monte_carlo_tasks, validate_distributions
+
+MANIFEST_FILE = "manifest.json"
+SUMMARY_PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def _atomic_write(path: str, text: str):
+    """一時ファイルに書いて fsync してから置き換え、途中で落ちても壊れたファイルを残さない"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RunningMoments:
+    """Mergeable count, mean, variance, min and max of a stream of values."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def update(self, values: Any):
+        """
+        Add a batch of values.
+
+        Args:
+            values: Array-like of new observations
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size == 0:
+            return
+        batch = RunningMoments()
+        batch.count = values.size
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other: "RunningMoments"):
+        """Combine with another accumulator (parallel variance formula)."""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta**2 * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def to_dict(self) -> dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, float]) -> "RunningMoments":
+        moments = cls()
+        moments.count = int(data["count"])
+        moments.mean = float(data["mean"])
+        moments.m2 = float(data["m2"])
+        moments.min = float(data["min"])
+        moments.max = float(data["max"])
+        return moments
+
+
+class HistogramSketch:
+    """
+    Fixed-bin histogram for approximate percentiles of a stream.
+
+    The range is fixed by the first batch (padded by half its span on each
+    side) unless given explicitly; values outside it are only counted as
+    underflow/overflow. Percentile error is at most one bin width inside the
+    range.
+    """
+
+    def __init__(self, bins: int = 2048, low: float | None = None, high: float | None = None):
+        self.bins = bins
+        self.low = low
+        self.high = high
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.moments = RunningMoments()
+
+    def update(self, values: Any):
+        """
+        Add a batch of values.
+
+        Args:
+            values: Array-like of new observations
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        if self.low is None or self.high is None:
+            span = float(values.max() - values.min()) or max(abs(float(values.mean())), 1.0)
+            self.low = float(values.min()) - span / 2
+            self.high = float(values.max()) + span / 2
+        self.moments.update(values)
+        self.underflow += int((values < self.low).sum())
+        self.overflow += int((values >= self.high).sum())
+        inside = values[(values >= self.low) & (values < self.high)]
+        self.counts += np.histogram(inside, bins=self.bins, range=(self.low, self.high))[0]
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate quantile by linear interpolation within bins.
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            Estimated value (clamped to the observed min/max)
+        """
+        total = self.underflow + int(self.counts.sum()) + self.overflow
+        if total == 0:
+            return float("nan")
+        target = q * total
+        if target <= self.underflow:
+            return self.moments.min
+        cumulative = self.underflow + np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, target))
+        if index >= self.bins:
+            return self.moments.max
+        width = (self.high - self.low) / self.bins
+        previous = cumulative[index - 1] if index > 0 else self.underflow
+        fraction = (target - previous) / self.counts[index] if self.counts[index] else 0.0
+        value = self.low + (index + fraction) * width
+        return float(min(max(value, self.moments.min), self.moments.max))
+
+    def summary(self) -> dict[str, float]:
+        """平均・標準偏差・パーセンタイルの要約を返す"""
+        result = {
+            "count": self.moments.count,
+            "mean": self.moments.mean,
+            "std": self.moments.std,
+            "min": self.moments.min,
+            "max": self.moments.max,
+        }
+        for p in SUMMARY_PERCENTILES:
+            result[f"p{p}"] = self.quantile(p / 100)
+        return result
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "bins": self.bins,
+            "low": self.low,
+            "high": self.high,
+            "counts": self.counts.tolist(),
+            "underflow": self.underflow,
+            "overflow": self.overflow,
+            "moments": self.moments.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "HistogramSketch":
+        sketch = cls(data["bins"], data["low"], data["high"])
+        sketch.counts = np.asarray(data["counts"], dtype=np.int64)
+        sketch.underflow = int(data["underflow"])
+        sketch.overflow = int(data["overflow"])
+        sketch.moments = RunningMoments.from_dict(data["moments"])
+        return sketch
+
+
+class CheckpointStore:
+    """
+    Atomic on-disk record of completed work units for one job.
+
+    Each commit writes the new unit results to a segment file and then
+    atomically replaces the manifest listing completed units, segments and
+    aggregates. A crash between the two leaves an orphan segment that is never
+    referenced, so the checkpoint always reflects whole commits.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        config: dict[str, Any],
+        resume: bool = False,
+        overwrite: bool = False,
+    ):
+        """
+        Open or create the checkpoint directory.
+
+        Args:
+            directory: Local checkpoint directory
+            config: JSON-serializable job definition; resuming requires a match
+            resume: Continue from an existing checkpoint instead of starting over
+            overwrite: Discard an existing checkpoint and start over
+
+        Raises:
+            ValueError: If resuming a checkpoint written for a different job
+            FileExistsError: If the directory already holds a checkpoint and
+                neither resume nor overwrite is set
+        """
+        self.directory = directory
+        self.config = json.loads(json.dumps(config))
+        os.makedirs(directory, exist_ok=True)
+
+        manifest = self.read_manifest(directory) if resume else None
+        if manifest is not None:
+            if manifest["config"] != self.config:
+                raise ValueError(
+                    f"Checkpoint in {directory} was written for a different job; "
+                    "use a new directory or run without resume"
+                )
+            self.completed = set(manifest["completed"])
+            self.segments = list(manifest["segments"])
+            self.aggregates = manifest["aggregates"]
+        else:
+            # 再開も上書きも指定されていなければ、既存の進捗は消さずに止める
+            existing = self._checkpoint_files()
+            if existing and not resume and not overwrite:
+                raise FileExistsError(
+                    f"{directory} already contains a checkpoint; "
+                    "pass resume to continue it or overwrite to start over"
+                )
+            for name in existing:
+                os.remove(os.path.join(directory, name))
+            self.completed = set()
+            self.segments = []
+            self.aggregates = {}
+
+    @staticmethod
+    def read_manifest(directory: str) -> dict[str, Any] | None:
+        """既存のマニフェストを読み込む (なければ None)"""
+        path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _checkpoint_files(self) -> list[str]:
+        """ディレクトリ内のマニフェストとセグメントのファイル名"""
+        return [
+            name
+            for name in os.listdir(self.directory)
+            if name == MANIFEST_FILE or name.startswith("segment-")
+        ]
+
+    def commit(self, results: dict[str, Any], aggregates: dict[str, Any] | None = None):
+        """
+        Record newly completed units and the current aggregates.
+
+        Args:
+            results: Unit id -> JSON-serializable result (may be empty)
+            aggregates: JSON-serializable partial aggregates for the whole job
+        """
+        if results:
+            name = f"segment-{len(self.segments):06d}.jsonl"
+            lines = [json.dumps({"unit": unit, "result": result}) for unit, result in results.items()]
+            _atomic_write(os.path.join(self.directory, name), "\n".join(lines) + "\n")
+            self.segments.append(name)
+            self.completed.update(results)
+        if aggregates is not None:
+            self.aggregates = aggregates
+
+        manifest = {
+            "config": self.config,
+            "completed": sorted(self.completed),
+            "segments": self.segments,
+            "aggregates": self.aggregates,
+            "updated_at": time.time(),
+        }
+        _atomic_write(os.path.join(self.directory, MANIFEST_FILE), json.dumps(manifest))
+
+    def iter_results(self) -> Iterator[tuple[str, Any]]:
+        """これまでにコミットされた (unit, result) を順に返す"""
+        for name in self.segments:
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    yield record["unit"], record["result"]
+
+
+def run_portfolio_with_checkpoints(
+    paths: Iterable[str],
+    checkpoint_dir: str,
+    resume: bool = False,
+    overwrite: bool = False,
+    checkpoint_every: int = 100,
+    checkpoint_seconds: float | None = 60.0,
+    **loader_kwargs: Any,
+) -> Iterator[dict[str, Any]]:
+    """
+    Value a universe of input files with periodic checkpoints.
+
+    Inputs already recorded in the checkpoint are not reloaded or revalued;
+    their stored results are yielded first. Only successful valuations are
+    recorded, so inputs that failed (e.g. a transient read error) are retried
+    on resume. Running moments of enterprise value and value per share are kept
+    as partial aggregates.
+
+    Args:
+        paths: Input file paths (the unit id of each file)
+        checkpoint_dir: Local checkpoint directory
+        resume: Skip work recorded in an existing checkpoint
+        overwrite: Discard an existing checkpoint and start over
+        checkpoint_every: Commit after this many newly completed files
+        checkpoint_seconds: Also commit when this much time has passed
+        **loader_kwargs: Passed to dcf_bulk_loader.iter_input_batches
+
+    Yields:
+        {"path", "result"} or {"path", "error"} records, as run_bulk_dcf_analysis
+    """
+    paths = [os.fspath(path) for path in paths]
+    # 対象ファイル一覧はダイジェストで照合し、マニフェストを小さく保つ
+    paths_digest = hashlib.blake2b("\n".join(paths).encode(), digest_size=16).hexdigest()
+    config = {"kind": "portfolio", "paths_digest": paths_digest, "count": len(paths)}
+    store = CheckpointStore(checkpoint_dir, config, resume, overwrite)
+
+    aggregates = {
+        metric: RunningMoments.from_dict(data)
+        for metric, data in store.aggregates.get("moments", {}).items()
+    }
+
+    for path, record in store.iter_results():
+        yield {"path": path, **record}
+
+    pending: dict[str, Any] = {}
+    last_commit = time.monotonic()
+
+    def commit():
+        nonlocal last_commit
+        store.commit(
+            pending,
+            {"moments": {metric: m.to_dict() for metric, m in aggregates.items()}},
+        )
+        pending.clear()
+        last_commit = time.monotonic()
+
+    remaining = [path for path in paths if path not in store.completed]
+    for batch in iter_input_batches(remaining, **loader_kwargs):
+        for entry in batch:
+            if entry["error"] is not None:
+                record = {"error": entry["error"]}
+            else:
+                try:
+                    record = {"result": run_dcf_analysis(entry["args"])}
+                except (ValueError, ZeroDivisionError, IndexError) as e:
+                    record = {"error": f"{type(e).__name__}: {e}"}
+
+            # 失敗した入力は記録せず、再開時に再試行する
+            if "error" not in record:
+                for metric in ("enterprise_value", "value_per_share"):
+                    aggregates.setdefault(metric, RunningMoments()).update(
+                        [record["result"]["metrics"][metric]]
+                    )
+                pending[entry["path"]] = record
+            yield {"path": entry["path"], **record}
+
+            due = checkpoint_seconds is not None and time.monotonic() - last_commit >= checkpoint_seconds
+            if len(pending) >= checkpoint_every or due:
+                commit()
+
+    commit()
+
+
+def run_monte_carlo_with_checkpoints(
+    model: DCFModel,
+    distributions: dict[str, dict[str, Any]],
+    n_paths: int,
+    checkpoint_dir: str,
+    seed: int | None = None,
+    resume: bool = False,
+    overwrite: bool = False,
+    chunk_size: int = 65536,
+    chunks_per_checkpoint: int = 16,
+    checkpoint_seconds: float | None = 60.0,
+    workers: int | None = None,
+    bins: int = 2048,
+    **eval_kwargs: Any,
+) -> dict[str, dict[str, float]]:
+    """
+    Run a long Monte Carlo simulation with periodic checkpoints.
+
+    Paths are not kept; each metric is reduced to running moments and a
+    histogram sketch. Chunk streams are derived from seed exactly as in
+    dcf_parallel.run_monte_carlo, so a resumed run produces the same aggregates
+    as an uninterrupted one. Without a seed, a fresh one is drawn and stored in
+    the checkpoint for resumption.
+
+    Args:
+        model: Model with assumptions and WACC set
+        distributions: Driver distributions (see dcf_parallel.run_monte_carlo)
+        n_paths: Number of simulated paths
+        checkpoint_dir: Local checkpoint directory
+        seed: Root seed for reproducible streams
+        resume: Skip chunks recorded in an existing checkpoint
+        overwrite: Discard an existing checkpoint and start over
+        chunk_size: Paths per work unit
+        chunks_per_checkpoint: Commit after this many newly completed chunks
+        checkpoint_seconds: Also commit when this much time has passed
+        workers: Number of processes (defaults to CPU count)
+        bins: Histogram bins per metric
+        **eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Returns:
+        Metric name -> summary statistics (mean, std, min, max, percentiles)
+    """
+    validate_distributions(distributions)
+
+    if seed is None:
+        manifest = CheckpointStore.read_manifest(checkpoint_dir) if resume else None
+        if manifest is not None:
+            seed = manifest["config"]["seed"]
+        else:
+            seed = int(np.random.SeedSequence().entropy)
+
+    config = {
+        "kind": "monte_carlo",
+        "model": model.state_fingerprint().hex(),
+        "distributions": distributions,
+        "n_paths": n_paths,
+        "seed": seed,
+        "chunk_size": chunk_size,
+        "eval_kwargs": eval_kwargs,
+    }
+    store = CheckpointStore(checkpoint_dir, config, resume, overwrite)
+    sketches = {
+        metric: HistogramSketch.from_dict(data) for metric, data in store.aggregates.items()
+    }
+
+    tasks = monte_carlo_tasks(n_paths, chunk_size, seed, distributions)
+    todo = [index for index in range(len(tasks)) if str(index) not in store.completed]
+
+    pending: list[int] = []
+    last_commit = time.monotonic()
+
+    def commit():
+        nonlocal last_commit
+        store.commit(
+            {str(index): None for index in pending},
+            {metric: sketch.to_dict() for metric, sketch in sketches.items()},
+        )
+        pending.clear()
+        last_commit = time.monotonic()
+
+    # プールと出力バッファは実行全体で1つだけ作り、チャンクが返るたびに集計する
+    # (結果はチャンク番号順に返るので、再開しても集計の順序は変わらない)
+    results = iter_task_results(
+        model,
+        [tasks[index] for index in todo],
+        workers=workers,
+        eval_kwargs=eval_kwargs,
+    )
+    for position, chunk in results:
+        for metric, values in chunk.items():
+            sketches.setdefault(metric, HistogramSketch(bins)).update(values)
+        pending.append(todo[position])
+
+        due = checkpoint_seconds is not None and time.monotonic() - last_commit >= checkpoint_seconds
+        if len(pending) >= chunks_per_checkpoint or due:
+            commit()
+
+    commit()
+
+    return {metric: sketch.summary() for metric, sketch in sketches.items()}
@@ -0,0 +1,205 @@
+"""
+N-dimensional DCF sensitivity cubes.
+Sweeps the Cartesian product of any number of drivers in bounded-memory chunks
+and writes each output metric to a memory-mapped .npy file with axis metadata,
+so cubes far larger than RAM can be built once and sliced later.
+"""
+
+import argparse
+import json
+import os
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+# dcf_model.py から DCFModel をインポート (同じディレクトリにある前提)
+from dcf_model import BATCH_DRIVERS, DCFModel, build_dcf_model
+
+METADATA_FILE = "axes.json"
+
+
+class SensitivityCube:
+    """Read-only view of a sensitivity cube stored on disk."""
+
+    def __init__(self, path: str):
+        """
+        Open a cube directory written by build_sensitivity_cube.
+
+        Args:
+            path: Cube directory
+        """
+        self.path = path
+        with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.axes = {axis["name"]: np.asarray(axis["values"]) for axis in self.metadata["axes"]}
+        self.metrics = list(self.metadata["metrics"])
+        self.shape = tuple(len(values) for values in self.axes.values())
+
+    def values(self, metric: str = "enterprise_value") -> np.ndarray:
+        """
+        Memory-mapped array for one metric (axes in metadata order).
+
+        Args:
+            metric: Output metric name
+
+        Returns:
+            Read-only memmap shaped like the cube
+        """
+        if metric not in self.metrics:
+            raise KeyError(f"Unknown metric: {metric}; available {self.metrics}")
+        return np.load(os.path.join(self.path, f"{metric}.npy"), mmap_mode="r")
+
+    def index_of(self, axis: str, value: float) -> int:
+        """軸上で value に最も近い格子点のインデックスを返す"""
+        if axis not in self.axes:
+            raise KeyError(f"Unknown axis: {axis}; available {list(self.axes)}")
+        return int(np.argmin(np.abs(self.axes[axis] - value)))
+
+    def sel(self, metric: str = "enterprise_value", **coords: float) -> tuple[np.ndarray, list[str]]:
+        """
+        Slice the cube by fixing some drivers at their nearest grid values.
+
+        Only the selected slice is read from disk.
+
+        Args:
+            metric: Output metric name
+            **coords: Driver name -> value to fix
+
+        Returns:
+            Tuple of (sliced array, names of the remaining axes)
+        """
+        unknown = set(coords) - set(self.axes)
+        if unknown:
+            raise KeyError(f"Unknown axes: {sorted(unknown)}")
+        index = tuple(
+            self.index_of(name, coords[name]) if name in coords else slice(None)
+            for name in self.axes
+        )
+        remaining = [name for name in self.axes if name not in coords]
+        return np.asarray(self.values(metric)[index]), remaining
+
+
+def build_sensitivity_cube(
+    model: DCFModel,
+    drivers: dict[str, Sequence[float]],
+    path: str,
+    metrics: Sequence[str] = ("enterprise_value",),
+    chunk_size: int = 1_000_000,
+    dtype: str = "float64",
+    **eval_kwargs: Any,
+) -> SensitivityCube:
+    """
+    Evaluate an N-way sensitivity cube and write it to memory-mapped files.
+
+    Grid points are generated chunk by chunk from flat indices, so memory use is
+    bounded by chunk_size regardless of the cube size.
+
+    Args:
+        model: Model with assumptions and WACC set
+        drivers: Driver name (see BATCH_DRIVERS) -> values to sweep
+        path: Output directory (created if missing)
+        metrics: Output metrics to store
+        chunk_size: Grid points evaluated per pass
+        dtype: Storage dtype ('float64' or 'float32')
+        **eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Returns:
+        SensitivityCube opened on the written directory
+    """
+    unknown = set(drivers) - set(BATCH_DRIVERS)
+    if unknown:
+        raise ValueError(f"Unknown drivers: {sorted(unknown)}; expected {BATCH_DRIVERS}")
+    if not drivers:
+        raise ValueError("At least one driver is required")
+
+    axes = {name: np.asarray(values, dtype=float) for name, values in drivers.items()}
+    shape = tuple(len(values) for values in axes.values())
+    total = int(np.prod(shape))
+
+    available = model.evaluate_batch(**eval_kwargs)
+    missing = [metric for metric in metrics if metric not in available]
+    if missing:
+        raise ValueError(f"Metrics not produced by the model: {missing}")
+
+    os.makedirs(path, exist_ok=True)
+    metadata_path = os.path.join(path, METADATA_FILE)
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
+    outputs = {
+        metric: np.lib.format.open_memmap(
+            os.path.join(path, f"{metric}.npy"), mode="w+", dtype=dtype, shape=shape
+        )
+        for metric in metrics
+    }
+    flat_outputs = {metric: array.reshape(-1) for metric, array in outputs.items()}
+
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        index = np.unravel_index(np.arange(start, stop), shape)
+        chunk_drivers = {name: axes[name][idx] for name, idx in zip(axes, index)}
+        results = model.evaluate_batch(chunk_drivers, **eval_kwargs)
+        for metric in metrics:
+            flat_outputs[metric][start:stop] = results[metric]
+
+    for array in outputs.values():
+        array.flush()
+    del flat_outputs, outputs
+
+    # メタデータは最後に書き込み、途中で中断した場合に不完全なキューブを開かないようにする
+    metadata = {
+        "company_name": model.company_name,
+        "axes": [{"name": name, "values": values.tolist()} for name, values in axes.items()],
+        "metrics": list(metrics),
+        "shape": list(shape),
+        "dtype": dtype,
+    }
+    with open(metadata_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    return SensitivityCube(path)
+
+
+if __name__ == "__main__":
+    # 入力JSONの読み込みには一括ローダーの検証ロジックを再利用する
+    from dcf_bulk_loader import load_dcf_input
+
+    parser = argparse.ArgumentParser(description="N-way DCF Sensitivity Cube CLI")
+    parser.add_argument("--input", required=True, help="Input JSON file (dcf_model schema)")
+    parser.add_argument(
+        "--axis",
+        nargs=4,
+        action="append",
+        required=True,
+        metavar=("NAME", "MIN", "MAX", "STEPS"),
+        help="Driver axis, repeatable (e.g. --axis wacc 0.07 0.12 51)",
+    )
+    parser.add_argument("--out", required=True, help="Output cube directory")
+    parser.add_argument(
+        "--metrics", nargs="+", default=["enterprise_value", "value_per_share"], help="Metrics to store"
+    )
+    parser.add_argument("--chunk_size", type=int, default=1_000_000, help="Grid points per pass")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64", help="Storage dtype")
+
+    args = parser.parse_args()
+
+    inputs = load_dcf_input(args.input)
+    model = build_dcf_model(inputs)
+    names = [name for name, _, _, _ in args.axis]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        parser.error(f"duplicate --axis names: {', '.join(duplicates)}")
+    axes = {name: np.linspace(float(low), float(high), int(steps)) for name, low, high, steps in args.axis}
+
+    cube = build_sensitivity_cube(
+        model,
+        axes,
+        args.out,
+        metrics=args.metrics,
+        chunk_size=args.chunk_size,
+        dtype=args.dtype,
+        net_debt=inputs.net_debt,
+        shares_outstanding=inputs.shares,
+    )
+
+    print(json.dumps({"path": cube.path, **cube.metadata}, indent=2))
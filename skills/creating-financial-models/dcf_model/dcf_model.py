@@ -5,12 +5,284 @@ Implements enterprise valuation using free cash flow projections.
 
 from typing import Any
 import argparse
+import hashlib
 import numpy as np
 import json
 
+
+class _StateRecord:
+    """
+    Compact model state with a dict-like interface.
+
+    Fields live in __slots__ and are coerced and validated when assigned, so
+    evaluation code can read them as attributes without per-call checks.
+    Series are stored as read-only float arrays, which lets copies share them.
+    Evaluation outputs are computed from already validated inputs and are
+    written without coercion to keep the per-evaluation cost low.
+    """
+
+    __slots__ = ()
+    _series_fields: frozenset[str] = frozenset()
+    _int_fields: frozenset[str] = frozenset()
+    _text_fields: frozenset[str] = frozenset()
+
+    def __init__(self, **values: Any):
+        for key, value in values.items():
+            self[key] = value
+
+    def _assign_trusted(self, values: dict[str, Any]):
+        """型変換と検証を通さずにフィールドを書き込む"""
+        setter = object.__setattr__
+        for key, value in values.items():
+            setter(self, key, value)
+
+    def __setattr__(self, key: str, value: Any):
+        object.__setattr__(self, key, self._coerce(key, value))
+
+    def _coerce(self, key: str, value: Any) -> Any:
+        if key in self._series_fields:
+            return _readonly_series(value, key)
+        if key in self._int_fields:
+            return int(value)
+        if key in self._text_fields:
+            return str(value)
+        return float(value)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(f"Unknown {type(self).__name__} field: {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __bool__(self) -> bool:
+        return any(hasattr(self, key) for key in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self) -> list[str]:
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def items(self) -> list[tuple[str, Any]]:
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def update(self, values: dict[str, Any]):
+        for key, value in values.items():
+            self[key] = value
+
+    def copy(self):
+        """Shallow copy; series arrays are read-only and shared."""
+        clone = object.__new__(type(self))
+        for key, value in self.items():
+            object.__setattr__(clone, key, value)
+        return clone
+
+    def update_digest(self, digest: Any):
+        """Feed the record's fields into a hashlib digest."""
+        digest.update(type(self).__name__.encode())
+        for key, value in self.items():
+            digest.update(key.encode())
+            if isinstance(value, np.ndarray):
+                digest.update(value.dtype.str.encode())
+                digest.update(value.tobytes())
+            else:
+                digest.update(repr(value).encode())
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            key: value.tolist() if isinstance(value, np.ndarray) else value
+            for key, value in self.items()
+        }
+
+
+def _readonly_series(values: Any, name: str, dtype: type = float) -> np.ndarray:
+    series = np.array(values, dtype=dtype)
+    if series.ndim != 1:
+        raise ValueError(f"{name} must be a one-dimensional sequence")
+    series.flags.writeable = False
+    return series
+
+
+class HistoricalFinancials(_StateRecord):
+    """Historical financial data; all series share the same length."""
+
+    __slots__ = (
+        "years",
+        "revenue",
+        "ebitda",
+        "capex",
+        "nwc",
+        "ebitda_margin",
+        "capex_percent",
+    )
+    _series_fields = frozenset(__slots__) - {"years"}
+
+    def _coerce(self, key: str, value: Any) -> Any:
+        if key == "years":
+            return _readonly_series(value, key, dtype=int)
+        return super()._coerce(key, value)
+
+
+class Assumptions(_StateRecord):
+    """Projection assumptions; per-year series hold projection_years values."""
+
+    __slots__ = (
+        "projection_years",
+        "revenue_growth",
+        "ebitda_margin",
+        "tax_rate",
+        "capex_percent",
+        "nwc_percent",
+        "terminal_growth",
+    )
+    _series_fields = frozenset(
+        ["revenue_growth", "ebitda_margin", "capex_percent", "nwc_percent"]
+    )
+    _int_fields = frozenset(["projection_years"])
+
+    def __init__(self, **values: Any):
+        # projection_years を先に設定し、年次系列の長さを検証させる
+        if "projection_years" in values:
+            values = {"projection_years": values.pop("projection_years"), **values}
+        super().__init__(**values)
+
+    def _coerce(self, key: str, value: Any) -> Any:
+        value = super()._coerce(key, value)
+        if key == "projection_years":
+            if value < 1:
+                raise ValueError("projection_years must be at least 1")
+            # 設定済みの年次系列を新しい予測年数で検証し直し、切り詰める
+            series = {
+                field: getattr(self, field) for field in self._series_fields if hasattr(self, field)
+            }
+            short = sorted(field for field, values in series.items() if len(values) < value)
+            if short:
+                raise ValueError(
+                    f"{', '.join(short)} must have {value} values before projection_years "
+                    f"is set to {value}; use set_assumptions to change the horizon"
+                )
+            for field, values in series.items():
+                object.__setattr__(self, field, values[:value])
+        elif key in self._series_fields:
+            if not hasattr(self, "projection_years"):
+                raise ValueError(f"projection_years must be set before {key}")
+            years = self.projection_years
+            if len(value) < years:
+                raise ValueError(f"{key} needs {years} values, got {len(value)}")
+            value = value[:years]
+        return value
+
+
+class WACCComponents(_StateRecord):
+    """Cost of capital inputs and the resulting WACC."""
+
+    __slots__ = (
+        "risk_free_rate",
+        "beta",
+        "market_premium",
+        "cost_of_equity",
+        "cost_of_debt",
+        "debt_to_equity",
+        "equity_weight",
+        "debt_weight",
+        "tax_rate",
+        "wacc",
+    )
+
+
+class ValuationResults(_StateRecord):
+    """Enterprise and equity valuation outputs."""
+
+    __slots__ = (
+        "enterprise_value",
+        "pv_fcf",
+        "pv_terminal",
+        "terminal_value",
+        "terminal_method",
+        "pv_fcf_detail",
+        "terminal_percent",
+        "equity_value",
+        "shares_outstanding",
+        "value_per_share",
+        "net_debt",
+        "cash",
+    )
+    _text_fields = frozenset(["terminal_method"])
+
+    def _coerce(self, key: str, value: Any) -> Any:
+        # 年次の現在価値は数個の値なので、配列ではなく不変のタプルで持つ
+        if key == "pv_fcf_detail":
+            return tuple(float(pv) for pv in value)
+        return super()._coerce(key, value)
+
+    @classmethod
+    def _from_evaluation(
+        cls,
+        enterprise_value: float,
+        pv_fcf: float,
+        pv_terminal: float,
+        terminal_value: float,
+        terminal_method: str,
+        pv_fcf_detail: tuple[float, ...],
+    ) -> "ValuationResults":
+        """評価結果からレコードを作る (入力は検証済みなので型変換を省略するホットパス)"""
+        record = object.__new__(cls)
+        setter = object.__setattr__
+        setter(record, "enterprise_value", enterprise_value)
+        setter(record, "pv_fcf", pv_fcf)
+        setter(record, "pv_terminal", pv_terminal)
+        setter(record, "terminal_value", terminal_value)
+        setter(record, "terminal_method", terminal_method)
+        setter(record, "pv_fcf_detail", pv_fcf_detail)
+        setter(record, "terminal_percent", pv_terminal / enterprise_value * 100)
+        return record
+
+
+SENSITIVITY_VARIABLES = ("wacc", "growth", "margin")
+
+# evaluate_batch で上書き可能なドライバー (WACC 以外は Assumptions のフィールド名と同じ)
+BATCH_DRIVERS = (
+    "wacc",
+    "terminal_growth",
+    "revenue_growth",
+    "ebitda_margin",
+    "tax_rate",
+    "capex_percent",
+    "nwc_percent",
+)
+
+
 class DCFModel:
     """Build and calculate DCF valuation models."""
 
+    __slots__ = (
+        "company_name",
+        "historical_financials",
+        "projections",
+        "assumptions",
+        "wacc_components",
+        "valuation_results",
+    )
+
     def __init__(self, company_name: str = "Company"):
         """
         Initialize DCF model.
@@ -19,11 +291,49 @@ class DCFModel:
             company_name: Name of the company being valued
         """
         self.company_name = company_name
-        self.historical_financials = {}
+        self.historical_financials = HistoricalFinancials()
         self.projections = {}
-        self.assumptions = {}
-        self.wacc_components = {}
-        self.valuation_results = {}
+        self.assumptions = Assumptions()
+        self.wacc_components = WACCComponents()
+        self.valuation_results = ValuationResults()
+
+    def fork(self, company_name: str | None = None) -> "DCFModel":
+        """
+        Create an independent copy of the model state.
+
+        Read-only series arrays are shared with the original, so forks are
+        cheap enough to hold many scenarios in memory at once.
+
+        Args:
+            company_name: Name for the fork (defaults to the original name)
+
+        Returns:
+            New DCFModel with copied state records
+        """
+        clone = DCFModel(self.company_name if company_name is None else company_name)
+        clone.historical_financials = self.historical_financials.copy()
+        clone.projections = dict(self.projections)
+        clone.assumptions = self.assumptions.copy()
+        clone.wacc_components = self.wacc_components.copy()
+        clone.valuation_results = self.valuation_results.copy()
+        return clone
+
+    def state_fingerprint(self) -> bytes:
+        """
+        Digest of every input that affects a valuation.
+
+        Covers historical financials, assumptions and WACC components; derived
+        projections and results are excluded. Equal fingerprints mean an
+        evaluation would produce the same outputs.
+
+        Returns:
+            16-byte BLAKE2b digest
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        self.historical_financials.update_digest(digest)
+        self.assumptions.update_digest(digest)
+        self.wacc_components.update_digest(digest)
+        return digest.digest()
 
     def set_historical_financials(
         self,
@@ -43,15 +353,17 @@ class DCFModel:
             nwc: Historical net working capital
             years: Historical years
         """
-        self.historical_financials = {
-            "years": years,
-            "revenue": revenue,
-            "ebitda": ebitda,
-            "capex": capex,
-            "nwc": nwc,
-            "ebitda_margin": [ebitda[i] / revenue[i] for i in range(len(revenue))],
-            "capex_percent": [capex[i] / revenue[i] for i in range(len(revenue))],
-        }
+        if len({len(revenue), len(ebitda), len(capex), len(nwc), len(years)}) != 1:
+            raise ValueError("Historical series must have the same length")
+
+        hist = HistoricalFinancials(
+            years=years, revenue=revenue, ebitda=ebitda, capex=capex, nwc=nwc
+        )
+        if np.any(hist.revenue == 0):
+            raise ValueError("Historical revenue must not contain zero")
+        hist.ebitda_margin = hist.ebitda / hist.revenue
+        hist.capex_percent = hist.capex / hist.revenue
+        self.historical_financials = hist
 
     def set_assumptions(
         self,
@@ -92,15 +404,16 @@ class DCFModel:
         if nwc_percent is None:
             nwc_percent = [0.10] * projection_years  # Default 10% of revenue
 
-        self.assumptions = {
-            "projection_years": projection_years,
-            "revenue_growth": revenue_growth,
-            "ebitda_margin": ebitda_margin,
-            "tax_rate": tax_rate,
-            "capex_percent": capex_percent,
-            "nwc_percent": nwc_percent,
-            "terminal_growth": terminal_growth,
-        }
+        # projection_years を先に設定し、年次系列の長さを検証させる
+        self.assumptions = Assumptions(
+            projection_years=projection_years,
+            revenue_growth=revenue_growth,
+            ebitda_margin=ebitda_margin,
+            tax_rate=tax_rate,
+            capex_percent=capex_percent,
+            nwc_percent=nwc_percent,
+            terminal_growth=terminal_growth,
+        )
 
     def calculate_wacc(
         self,
@@ -138,18 +451,18 @@ class DCFModel:
         # Calculate WACC
         wacc = equity_weight * cost_of_equity + debt_weight * cost_of_debt * (1 - tax_rate)
 
-        self.wacc_components = {
-            "risk_free_rate": risk_free_rate,
-            "beta": beta,
-            "market_premium": market_premium,
-            "cost_of_equity": cost_of_equity,
-            "cost_of_debt": cost_of_debt,
-            "debt_to_equity": debt_to_equity,
-            "equity_weight": equity_weight,
-            "debt_weight": debt_weight,
-            "tax_rate": tax_rate,
-            "wacc": wacc,
-        }
+        self.wacc_components = WACCComponents(
+            risk_free_rate=risk_free_rate,
+            beta=beta,
+            market_premium=market_premium,
+            cost_of_equity=cost_of_equity,
+            cost_of_debt=cost_of_debt,
+            debt_to_equity=debt_to_equity,
+            equity_weight=equity_weight,
+            debt_weight=debt_weight,
+            tax_rate=tax_rate,
+            wacc=wacc,
+        )
 
         return wacc
 
@@ -160,69 +473,81 @@ class DCFModel:
         Returns:
             Dictionary with projected financials
         """
-        years = self.assumptions["projection_years"]
+        assumptions = self.assumptions
+        years = assumptions.projection_years
 
         # Start with last historical revenue if available
-        if self.historical_financials and "revenue" in self.historical_financials:
-            base_revenue = self.historical_financials["revenue"][-1]
+        historical_revenue = getattr(self.historical_financials, "revenue", None)
+        if historical_revenue is not None:
+            base_revenue = float(historical_revenue[-1])
         else:
             base_revenue = 1000  # Default base
 
-        projections = {
-            "year": list(range(1, years + 1)),
-            "revenue": [],
-            "ebitda": [],
-            "ebit": [],
-            "tax": [],
-            "nopat": [],
-            "capex": [],
-            "nwc_change": [],
-            "fcf": [],
-        }
+        # 予測期間は数年程度なので、numpy の呼び出しコストを避けて Python の float で計算する
+        # (多数のシナリオをまとめて評価する場合は evaluate_batch を使う)
+        growth = assumptions.revenue_growth.tolist()
+        margin = assumptions.ebitda_margin.tolist()
+        capex_percent = assumptions.capex_percent.tolist()
+        nwc_percent = assumptions.nwc_percent.tolist()
+        tax_rate = assumptions.tax_rate
+
+        revenues, ebitdas, ebits, taxes, nopats, capexes, nwc_changes, fcfs = (
+            [] for _ in range(8)
+        )
 
         prev_revenue = base_revenue
         prev_nwc = base_revenue * 0.10  # Initial NWC assumption
 
         for i in range(years):
             # Revenue
-            revenue = prev_revenue * (1 + self.assumptions["revenue_growth"][i])
-            projections["revenue"].append(revenue)
+            revenue = prev_revenue * (1 + growth[i])
 
             # EBITDA
-            ebitda = revenue * self.assumptions["ebitda_margin"][i]
-            projections["ebitda"].append(ebitda)
+            ebitda = revenue * margin[i]
 
             # EBIT (assuming depreciation = capex for simplicity)
-            depreciation = revenue * self.assumptions["capex_percent"][i]
+            depreciation = revenue * capex_percent[i]
             ebit = ebitda - depreciation
-            projections["ebit"].append(ebit)
-
-            # Tax
-            tax = ebit * self.assumptions["tax_rate"]
-            projections["tax"].append(tax)
 
-            # NOPAT
+            # Tax and NOPAT
+            tax = ebit * tax_rate
             nopat = ebit - tax
-            projections["nopat"].append(nopat)
 
             # Capex
-            capex = revenue * self.assumptions["capex_percent"][i]
-            projections["capex"].append(capex)
+            capex = revenue * capex_percent[i]
 
             # NWC change
-            nwc = revenue * self.assumptions["nwc_percent"][i]
+            nwc = revenue * nwc_percent[i]
             nwc_change = nwc - prev_nwc
-            projections["nwc_change"].append(nwc_change)
 
             # Free Cash Flow
             fcf = nopat + depreciation - capex - nwc_change
-            projections["fcf"].append(fcf)
+
+            revenues.append(revenue)
+            ebitdas.append(ebitda)
+            ebits.append(ebit)
+            taxes.append(tax)
+            nopats.append(nopat)
+            capexes.append(capex)
+            nwc_changes.append(nwc_change)
+            fcfs.append(fcf)
 
             prev_revenue = revenue
             prev_nwc = nwc
 
+        projections = {
+            "year": list(range(1, years + 1)),
+            "revenue": revenues,
+            "ebitda": ebitdas,
+            "ebit": ebits,
+            "tax": taxes,
+            "nopat": nopats,
+            "capex": capexes,
+            "nwc_change": nwc_changes,
+            "fcf": fcfs,
+        }
         self.projections = projections
-        return projections
+        return self.projections
 
     def calculate_terminal_value(
         self, method: str = "growth", exit_multiple: float | None = None
@@ -243,8 +568,8 @@ class DCFModel:
         if method == "growth":
             # Gordon growth model
             final_fcf = self.projections["fcf"][-1]
-            terminal_growth = self.assumptions["terminal_growth"]
-            wacc = self.wacc_components["wacc"]
+            terminal_growth = self.assumptions.terminal_growth
+            wacc = self.wacc_components.wacc
 
             # FCF in terminal year
             terminal_fcf = final_fcf * (1 + terminal_growth)
@@ -280,18 +605,14 @@ class DCFModel:
         if not self.projections:
             self.project_cash_flows()
 
-        if "wacc" not in self.wacc_components:
+        wacc = getattr(self.wacc_components, "wacc", None)
+        if wacc is None:
             raise ValueError("Must calculate WACC first")
 
-        wacc = self.wacc_components["wacc"]
-        years = self.assumptions["projection_years"]
+        years = self.assumptions.projection_years
 
         # Calculate PV of projected cash flows
-        pv_fcf = []
-        for i, fcf in enumerate(self.projections["fcf"]):
-            discount_factor = (1 + wacc) ** (i + 1)
-            pv = fcf / discount_factor
-            pv_fcf.append(pv)
+        pv_fcf = [fcf / (1 + wacc) ** (i + 1) for i, fcf in enumerate(self.projections["fcf"])]
 
         total_pv_fcf = sum(pv_fcf)
 
@@ -305,15 +626,15 @@ class DCFModel:
         # Enterprise value
         enterprise_value = total_pv_fcf + pv_terminal
 
-        self.valuation_results = {
-            "enterprise_value": enterprise_value,
-            "pv_fcf": total_pv_fcf,
-            "pv_terminal": pv_terminal,
-            "terminal_value": terminal_value,
-            "terminal_method": terminal_method,
-            "pv_fcf_detail": pv_fcf,
-            "terminal_percent": pv_terminal / enterprise_value * 100,
-        }
+        # 入力は設定時に検証済みなので、結果は型変換を通さずに書き込む
+        self.valuation_results = ValuationResults._from_evaluation(
+            enterprise_value,
+            total_pv_fcf,
+            pv_terminal,
+            terminal_value,
+            terminal_method,
+            tuple(pv_fcf),
+        )
 
         return self.valuation_results
 
@@ -334,7 +655,7 @@ class DCFModel:
         if "enterprise_value" not in self.valuation_results:
             raise ValueError("Must calculate enterprise value first")
 
-        ev = self.valuation_results["enterprise_value"]
+        ev = self.valuation_results.enterprise_value
 
         # Equity value = EV - Net Debt
         equity_value = ev - net_debt + cash
@@ -350,7 +671,9 @@ class DCFModel:
             "cash": cash,
         }
 
-        self.valuation_results.update(equity_results)
+        self.valuation_results._assign_trusted(
+            {key: float(value) for key, value in equity_results.items()}
+        )
         return equity_results
 
     def sensitivity_analysis(
@@ -360,7 +683,9 @@ class DCFModel:
         Perform two-way sensitivity analysis on valuation.
 
         Args:
-            variable1: First variable to test ('wacc', 'growth', 'margin')
+            variable1: First variable to test ('wacc', 'growth', 'margin'); here
+                'growth' is the terminal growth rate (evaluate_batch uses
+                'terminal_growth' and 'revenue_growth' instead)
             range1: Range of values for variable1
             variable2: Second variable to test
             range2: Range of values for variable2
@@ -368,41 +693,112 @@ class DCFModel:
         Returns:
             2D array of valuations
         """
+        if variable1 not in SENSITIVITY_VARIABLES or variable2 not in SENSITIVITY_VARIABLES:
+            raise ValueError(f"Variables must be one of {SENSITIVITY_VARIABLES}")
+
         results = np.zeros((len(range1), len(range2)))
 
-        # Store original values
-        orig_wacc = self.wacc_components.get("wacc", 0.10)
-        orig_growth = self.assumptions.get("terminal_growth", 0.03)
-        orig_margin = self.assumptions.get("ebitda_margin", [0.20] * 5)
+        # Store original values (レコードのコピーは系列配列を共有するので軽量)
+        orig_assumptions = self.assumptions.copy()
+        orig_wacc_components = self.wacc_components.copy()
+        years = self.assumptions.projection_years
 
         for i, val1 in enumerate(range1):
             for j, val2 in enumerate(range2):
-                # Update first variable
-                if variable1 == "wacc":
-                    self.wacc_components["wacc"] = val1
-                elif variable1 == "growth":
-                    self.assumptions["terminal_growth"] = val1
-                elif variable1 == "margin":
-                    self.assumptions["ebitda_margin"] = [val1] * len(orig_margin)
-
-                # Update second variable
-                if variable2 == "wacc":
-                    self.wacc_components["wacc"] = val2
-                elif variable2 == "growth":
-                    self.assumptions["terminal_growth"] = val2
-                elif variable2 == "margin":
-                    self.assumptions["ebitda_margin"] = [val2] * len(orig_margin)
+                self._set_sensitivity_variable(variable1, val1, years)
+                self._set_sensitivity_variable(variable2, val2, years)
 
                 # Recalculate
                 self.project_cash_flows()
                 valuation = self.calculate_enterprise_value()
-                results[i, j] = valuation["enterprise_value"]
+                results[i, j] = valuation.enterprise_value
 
         # Restore original values
-        self.wacc_components["wacc"] = orig_wacc
-        self.assumptions["terminal_growth"] = orig_growth
-        self.assumptions["ebitda_margin"] = orig_margin
+        self.assumptions = orig_assumptions
+        self.wacc_components = orig_wacc_components
+
+        return results
+
+    def _set_sensitivity_variable(self, variable: str, value: float, years: int):
+        if variable == "wacc":
+            self.wacc_components.wacc = value
+        elif variable == "growth":
+            self.assumptions.terminal_growth = value
+        elif variable == "margin":
+            self.assumptions.ebitda_margin = np.full(years, value)
+
+    def evaluate_batch(
+        self,
+        drivers: dict[str, Any] | None = None,
+        terminal_method: str = "growth",
+        exit_multiple: float | None = None,
+        net_debt: float | None = None,
+        shares_outstanding: float | None = None,
+        cash: float | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Value many variations of the current model state in one vectorized pass.
+
+        Each driver is an array of per-scenario values; per-year drivers are
+        applied uniformly across the projection period. Drivers not given keep
+        the model's current values. The model state itself is not modified.
+
+        Args:
+            drivers: Values keyed by name in BATCH_DRIVERS ('wacc' plus the
+                Assumptions field names, e.g. 'revenue_growth'; unlike
+                sensitivity_analysis, there is no ambiguous 'growth')
+            terminal_method: Method for terminal value calculation
+            exit_multiple: Exit multiple if using multiple method
+            net_debt: Net debt for the equity bridge (defaults to the last
+                calculate_equity_value inputs; equity outputs are omitted if unknown)
+            shares_outstanding: Number of shares (millions)
+            cash: Cash and equivalents (if not netted)
+
+        Returns:
+            Arrays of valuation metrics broadcast over the drivers
+        """
+        drivers = drivers or {}
+        unknown = set(drivers) - set(BATCH_DRIVERS)
+        if unknown:
+            raise ValueError(f"Unknown drivers: {sorted(unknown)}; expected {BATCH_DRIVERS}")
+        if "wacc" not in self.wacc_components and "wacc" not in drivers:
+            raise ValueError("Must calculate WACC first")
+
+        assumptions = self.assumptions
+        if "revenue" in self.historical_financials:
+            base_revenue = self.historical_financials.revenue[-1]
+        else:
+            base_revenue = 1000  # Default base
 
+        def per_year(name: str, series: np.ndarray) -> np.ndarray:
+            if name not in drivers:
+                return series
+            return np.asarray(drivers[name], dtype=float)[..., None]
+
+        results = evaluate_dcf_batch(
+            base_revenue=base_revenue,
+            revenue_growth=per_year("revenue_growth", assumptions.revenue_growth),
+            ebitda_margin=per_year("ebitda_margin", assumptions.ebitda_margin),
+            capex_percent=per_year("capex_percent", assumptions.capex_percent),
+            nwc_percent=per_year("nwc_percent", assumptions.nwc_percent),
+            tax_rate=drivers.get("tax_rate", assumptions.tax_rate),
+            wacc=drivers.get("wacc", self.wacc_components.get("wacc")),
+            terminal_growth=drivers.get("terminal_growth", assumptions.terminal_growth),
+            terminal_method=terminal_method,
+            exit_multiple=exit_multiple,
+            years=assumptions.projection_years,
+        )
+
+        if net_debt is None:
+            net_debt = self.valuation_results.get("net_debt")
+        if net_debt is not None:
+            if shares_outstanding is None:
+                shares_outstanding = self.valuation_results.get("shares_outstanding", 100)
+            if cash is None:
+                cash = self.valuation_results.get("cash", 0)
+            results.update(
+                equity_bridge(results["enterprise_value"], net_debt, shares_outstanding, cash)
+            )
         return results
 
     def generate_summary(self) -> str:
@@ -448,6 +844,165 @@ class DCFModel:
         return "\n".join(summary)
 
 
+# Vectorized batch valuation
+
+
+def evaluate_dcf_batch(
+    base_revenue: Any,
+    revenue_growth: Any,
+    ebitda_margin: Any,
+    capex_percent: Any,
+    nwc_percent: Any,
+    tax_rate: Any,
+    wacc: Any,
+    terminal_growth: Any,
+    terminal_method: str = "growth",
+    exit_multiple: float | None = None,
+    years: int | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Value a batch of DCF scenarios in one vectorized pass.
+
+    Per-year inputs have shape (..., T) or (..., 1) and per-scenario inputs have
+    shape (...); leading dimensions broadcast against each other and a trailing
+    1 applies the value to every projection year. The arithmetic mirrors
+    DCFModel.project_cash_flows and calculate_enterprise_value.
+
+    Args:
+        base_revenue: Last historical revenue
+        revenue_growth: Annual revenue growth rates
+        ebitda_margin: EBITDA margins by year
+        capex_percent: Capex as % of revenue
+        nwc_percent: NWC as % of revenue
+        tax_rate: Corporate tax rate
+        wacc: Discount rate
+        terminal_growth: Terminal growth rate
+        terminal_method: 'growth' for perpetuity growth, 'multiple' for exit multiple
+        exit_multiple: EV/EBITDA exit multiple (if using multiple method)
+        years: Projection horizon T (defaults to the longest per-year input)
+
+    Returns:
+        Arrays of enterprise_value, pv_fcf, pv_terminal, terminal_value and terminal_percent
+    """
+    per_year_inputs = [
+        np.atleast_1d(np.asarray(values, dtype=float))
+        for values in (revenue_growth, ebitda_margin, capex_percent, nwc_percent)
+    ]
+    if years is None:
+        years = max(values.shape[-1] for values in per_year_inputs)
+
+    # 予測期間の長さを入力の形状から推測せず、全ての年次入力を (..., T) に揃える
+    revenue_growth, ebitda_margin, capex_percent, nwc_percent = (
+        np.broadcast_to(values, values.shape[:-1] + (years,)) for values in per_year_inputs
+    )
+    base_revenue = np.asarray(base_revenue, dtype=float)
+    tax_rate = np.asarray(tax_rate, dtype=float)[..., None]
+    wacc = np.asarray(wacc, dtype=float)
+    terminal_growth = np.asarray(terminal_growth, dtype=float)
+
+    batch_shape = np.broadcast_shapes(
+        base_revenue.shape,
+        revenue_growth.shape[:-1],
+        ebitda_margin.shape[:-1],
+        capex_percent.shape[:-1],
+        nwc_percent.shape[:-1],
+        tax_rate.shape[:-1],
+        wacc.shape,
+        terminal_growth.shape,
+    )
+
+    # 単体計算と同じ順序で複利計算するため、ベース売上を先頭に置いて累積積を取る
+    base = np.broadcast_to(base_revenue[..., None], batch_shape + (1,))
+    growth_path = np.concatenate(
+        [base, np.broadcast_to(1 + revenue_growth, batch_shape + (years,))], axis=-1
+    )
+    revenue = np.cumprod(growth_path, axis=-1)[..., 1:]
+
+    ebitda = revenue * ebitda_margin
+    depreciation = revenue * capex_percent
+    ebit = ebitda - depreciation
+    nopat = ebit - ebit * tax_rate
+    capex = revenue * capex_percent
+    nwc = revenue * nwc_percent
+    nwc_change = np.diff(nwc, axis=-1, prepend=base * 0.10)
+    fcf = nopat + depreciation - capex - nwc_change
+
+    discount_factors = (1 + wacc[..., None]) ** np.arange(1, years + 1)
+    pv_fcf = (fcf / discount_factors).sum(axis=-1)
+
+    if terminal_method == "growth":
+        terminal_value = fcf[..., -1] * (1 + terminal_growth) / (wacc - terminal_growth)
+    elif terminal_method == "multiple":
+        terminal_value = ebitda[..., -1] * (10 if exit_multiple is None else exit_multiple)
+    else:
+        raise ValueError("Method must be 'growth' or 'multiple'")
+
+    pv_terminal = terminal_value / (1 + wacc) ** years
+    enterprise_value = pv_fcf + pv_terminal
+
+    return {
+        "enterprise_value": enterprise_value,
+        "pv_fcf": pv_fcf,
+        "pv_terminal": pv_terminal,
+        "terminal_value": np.broadcast_to(terminal_value, batch_shape),
+        "terminal_percent": pv_terminal / enterprise_value * 100,
+    }
+
+
+def calculate_wacc_batch(
+    risk_free_rate: Any,
+    beta: Any,
+    market_premium: Any,
+    cost_of_debt: Any,
+    debt_to_equity: Any,
+    tax_rate: Any,
+) -> np.ndarray:
+    """
+    Vectorized counterpart of DCFModel.calculate_wacc.
+
+    Args:
+        risk_free_rate: Risk-free rate
+        beta: Equity beta
+        market_premium: Equity market risk premium
+        cost_of_debt: Pre-tax cost of debt
+        debt_to_equity: Debt-to-equity ratio
+        tax_rate: Tax rate
+
+    Returns:
+        WACC array broadcast over the inputs
+    """
+    debt_to_equity = np.asarray(debt_to_equity, dtype=float)
+    cost_of_equity = np.asarray(risk_free_rate, dtype=float) + np.asarray(beta) * market_premium
+    equity_weight = 1 / (1 + debt_to_equity)
+    debt_weight = debt_to_equity / (1 + debt_to_equity)
+    return equity_weight * cost_of_equity + debt_weight * np.asarray(cost_of_debt) * (
+        1 - np.asarray(tax_rate)
+    )
+
+
+def equity_bridge(
+    enterprise_value: Any, net_debt: Any, shares_outstanding: Any, cash: Any = 0
+) -> dict[str, np.ndarray]:
+    """
+    Vectorized bridge from enterprise value to equity value per share.
+
+    Args:
+        enterprise_value: Enterprise values
+        net_debt: Total debt minus cash
+        shares_outstanding: Number of shares (millions)
+        cash: Cash and equivalents (if not netted)
+
+    Returns:
+        Arrays of equity_value and value_per_share
+    """
+    equity_value = np.asarray(enterprise_value, dtype=float) - net_debt + cash
+    shares = np.asarray(shares_outstanding, dtype=float)
+    # 株式数が0以下の場合は calculate_equity_value と同様に 0 とする
+    safe_shares = np.where(shares > 0, shares, 1.0)
+    value_per_share = np.where(shares > 0, equity_value / safe_shares, 0.0)
+    return {"equity_value": equity_value, "value_per_share": value_per_share}
+
+
 # Helper functions for common calculations
 
 
@@ -489,9 +1044,9 @@ def calculate_fcf_cagr(fcf_series: list[float]) -> float:
     return cagr
 
 
-def run_dcf_analysis(args: argparse.Namespace) -> dict[str, Any]:
+def build_dcf_model(args: argparse.Namespace) -> DCFModel:
     """
-    設定値を受け取り、DCF分析を実行して結果の辞書を返す関数
+    設定値からモデルを組み立て、WACC計算まで済ませた DCFModel を返す関数
     """
     
     # リストの長さ調整ヘルパー
@@ -502,6 +1057,12 @@ def run_dcf_analysis(args: argparse.Namespace) -> dict[str, Any]:
             return input_list * length
         return input_list
 
+    # 未指定 (None) の場合は set_assumptions のデフォルトに任せる
+    def expand_optional(input_list, length):
+        if input_list is None:
+            return None
+        return expand_list(input_list, length)
+
     # 1. モデルの初期化
     model = DCFModel(args.company)
 
@@ -520,11 +1081,13 @@ def run_dcf_analysis(args: argparse.Namespace) -> dict[str, Any]:
         revenue_growth=expand_list(args.growth, args.years),
         ebitda_margin=expand_list(args.margin, args.years),
         tax_rate=args.tax_rate,
+        capex_percent=expand_optional(getattr(args, "capex_percent", None), args.years),
+        nwc_percent=expand_optional(getattr(args, "nwc_percent", None), args.years),
         terminal_growth=args.terminal_growth,
     )
 
     # 4. WACC計算
-    wacc = model.calculate_wacc(
+    model.calculate_wacc(
         risk_free_rate=args.rf,
         beta=args.beta,
         market_premium=args.erp,
@@ -532,6 +1095,18 @@ def run_dcf_analysis(args: argparse.Namespace) -> dict[str, Any]:
         debt_to_equity=args.debt_equity,
     )
 
+    return model
+
+
+def run_dcf_analysis(args: argparse.Namespace) -> dict[str, Any]:
+    """
+    設定値を受け取り、DCF分析を実行して結果の辞書を返す関数
+    """
+
+    # 1-4. モデルの組み立て (過去データ・前提・WACC)
+    model = build_dcf_model(args)
+    wacc = model.wacc_components.wacc
+
     # 5. 計算実行
     model.project_cash_flows()
     model.calculate_enterprise_value()
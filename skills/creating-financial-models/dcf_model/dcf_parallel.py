@@ -0,0 +1,536 @@
+"""
+Multi-core Monte Carlo and grid execution for DCF models.
+Work is split into fixed-size chunks evaluated with DCFModel.evaluate_batch in a
+process pool. Inputs are shared read-only and workers write results directly
+into a shared-memory output buffer, so no per-result pickling takes place.
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+from collections.abc import Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+
+# dcf_model.py から DCFModel をインポート (同じディレクトリにある前提)
+from dcf_model import BATCH_DRIVERS, DCFModel, build_dcf_model
+
+DISTRIBUTIONS = ("normal", "uniform", "triangular", "lognormal")
+
+# ワーカープロセスごとの状態 (initializer で設定)
+_WORKER: dict[str, Any] = {}
+
+
+def _draw(rng: np.random.Generator, spec: dict[str, Any], size: int) -> np.ndarray:
+    """分布定義に従って乱数を生成する"""
+    dist = spec["dist"]
+    if dist == "normal":
+        return rng.normal(spec["mean"], spec["std"], size)
+    if dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"], size)
+    if dist == "triangular":
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], size)
+    if dist == "lognormal":
+        return rng.lognormal(spec["mean"], spec["sigma"], size)
+    raise ValueError(f"Unknown distribution: {dist}")
+
+
+def _validate_drivers(names: Sequence[str]):
+    unknown = set(names) - set(BATCH_DRIVERS)
+    if unknown:
+        raise ValueError(f"Unknown drivers: {sorted(unknown)}; expected {BATCH_DRIVERS}")
+
+
+def validate_distributions(distributions: dict[str, dict[str, Any]]):
+    """
+    Check Monte Carlo driver distributions before any work is started.
+
+    Args:
+        distributions: Driver name -> {"dist": ..., parameters}
+
+    Raises:
+        ValueError: If a driver or distribution name is unknown
+    """
+    _validate_drivers(distributions)
+    for name, spec in distributions.items():
+        if spec.get("dist") not in DISTRIBUTIONS:
+            raise ValueError(f"{name}: dist must be one of {DISTRIBUTIONS}")
+
+
+def _chunk_bounds(total: int, chunk_size: int) -> list[tuple[int, int]]:
+    return [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+
+
+def monte_carlo_tasks(
+    n_paths: int,
+    chunk_size: int,
+    seed: int | None,
+    distributions: dict[str, dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """
+    Split a Monte Carlo run into chunk tasks with independent random streams.
+
+    Chunk boundaries depend only on n_paths and chunk_size and each chunk's
+    stream is spawned from seed by chunk number, so any subset of the tasks can
+    be evaluated in any process and still reproduce the full run.
+
+    Args:
+        n_paths: Number of simulated paths
+        chunk_size: Paths per task
+        seed: Root seed for reproducible streams
+        distributions: Driver distributions (see run_monte_carlo)
+
+    Returns:
+        Tasks for execute_tasks / iter_task_results, in path order
+    """
+    bounds = _chunk_bounds(n_paths, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    return [
+        {
+            "kind": "monte_carlo",
+            "start": start,
+            "stop": stop,
+            "seed": chunk_seed,
+            "distributions": distributions,
+        }
+        for (start, stop), chunk_seed in zip(bounds, seeds)
+    ]
+
+
+def _output_metrics(model: DCFModel, eval_kwargs: dict[str, Any]) -> list[str]:
+    # 1点だけ評価して出力される指標の一覧を確定させる
+    return sorted(model.evaluate_batch(**eval_kwargs))
+
+
+def _chunk_drivers(task: dict[str, Any], inputs: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """チャンクの範囲 [start, stop) に対応するドライバー値を組み立てる"""
+    start, stop = task["start"], task["stop"]
+    kind = task["kind"]
+    if kind == "grid":
+        names = task["names"]
+        shape = tuple(len(inputs[name]) for name in names)
+        index = np.unravel_index(np.arange(start, stop), shape)
+        return {name: inputs[name][idx] for name, idx in zip(names, index)}
+    if kind == "scenarios":
+        return {name: values[start:stop] for name, values in inputs.items()}
+    if kind == "monte_carlo":
+        # チャンクごとに独立した乱数系列を使うので、ワーカー数に依らず結果が一致する
+        rng = np.random.default_rng(task["seed"])
+        size = stop - start
+        return {name: _draw(rng, spec, size) for name, spec in task["distributions"].items()}
+    raise ValueError(f"Unknown task kind: {kind}")
+
+
+def _evaluate_chunk(
+    model: DCFModel,
+    task: dict[str, Any],
+    inputs: dict[str, np.ndarray],
+    output: np.ndarray,
+    offset: int,
+    metrics: list[str],
+    eval_kwargs: dict[str, Any],
+) -> int:
+    """チャンクを評価し、出力バッファの offset 以降に書き込む"""
+    results = model.evaluate_batch(_chunk_drivers(task, inputs), **eval_kwargs)
+    size = task["stop"] - task["start"]
+    for row, metric in enumerate(metrics):
+        output[row, offset : offset + size] = results[metric]
+    return size
+
+
+def _attach(spec: tuple[str, tuple[int, ...], str]) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(
+    model: DCFModel,
+    input_specs: dict[str, tuple[str, tuple[int, ...], str]],
+    output_spec: tuple[str, tuple[int, ...], str],
+    metrics: list[str],
+    eval_kwargs: dict[str, Any],
+):
+    handles = []
+    inputs = {}
+    for key, spec in input_specs.items():
+        shm, array = _attach(spec)
+        array.flags.writeable = False
+        handles.append(shm)
+        inputs[key] = array
+    shm, output = _attach(output_spec)
+    handles.append(shm)
+    _WORKER.update(
+        model=model,
+        inputs=inputs,
+        output=output,
+        metrics=metrics,
+        eval_kwargs=eval_kwargs,
+        handles=handles,
+    )
+
+
+def _run_worker_chunk(task: dict[str, Any], offset: int) -> int:
+    return _evaluate_chunk(
+        _WORKER["model"],
+        task,
+        _WORKER["inputs"],
+        _WORKER["output"],
+        offset,
+        _WORKER["metrics"],
+        _WORKER["eval_kwargs"],
+    )
+
+
+def _to_shared(array: np.ndarray) -> tuple[shared_memory.SharedMemory, tuple[str, tuple[int, ...], str]]:
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+@contextmanager
+def _worker_pool(
+    model: DCFModel,
+    inputs: dict[str, np.ndarray],
+    output_shape: tuple[int, int],
+    workers: int,
+    metrics: list[str],
+    eval_kwargs: dict[str, Any],
+) -> Iterator[tuple[ProcessPoolExecutor, np.ndarray]]:
+    """入力と出力バッファを共有メモリに置いたプロセスプールを1つ用意する"""
+    segments = []
+    executor = None
+    try:
+        input_specs = {}
+        for key, array in inputs.items():
+            shm, spec = _to_shared(array)
+            segments.append(shm)
+            input_specs[key] = spec
+        out_shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(output_shape)) * 8, 1))
+        segments.append(out_shm)
+        output_spec = (out_shm.name, output_shape, np.dtype(float).str)
+
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model, input_specs, output_spec, metrics, eval_kwargs),
+        )
+        yield executor, np.ndarray(output_shape, dtype=float, buffer=out_shm.buf)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+
+def _resolve_workers(workers: int | None, n_tasks: int) -> int:
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(min(workers, n_tasks), 1)
+
+
+def execute_tasks(
+    model: DCFModel,
+    tasks: list[dict[str, Any]],
+    inputs: dict[str, np.ndarray],
+    total: int,
+    workers: int | None = None,
+    eval_kwargs: dict[str, Any] | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Evaluate tasks covering [0, total) and return the full result arrays.
+
+    Workers write straight into one shared-memory output buffer at each
+    task's own position, so no results are pickled.
+
+    Args:
+        model: Model with assumptions and WACC set
+        tasks: Chunk tasks (e.g. from monte_carlo_tasks)
+        inputs: Arrays shared read-only with the workers
+        total: Number of output points
+        workers: Number of processes (defaults to CPU count)
+        eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Returns:
+        Metric name -> array of length total
+    """
+    eval_kwargs = eval_kwargs or {}
+    metrics = _output_metrics(model, eval_kwargs)
+    workers = _resolve_workers(workers, len(tasks))
+
+    if workers <= 1:
+        output = np.empty((len(metrics), total))
+        for task in tasks:
+            _evaluate_chunk(model, task, inputs, output, task["start"], metrics, eval_kwargs)
+        return dict(zip(metrics, output))
+
+    with _worker_pool(model, inputs, (len(metrics), total), workers, metrics, eval_kwargs) as (
+        executor,
+        output,
+    ):
+        offsets = [task["start"] for task in tasks]
+        for _ in executor.map(_run_worker_chunk, tasks, offsets):
+            pass
+        return dict(zip(metrics, output.copy()))
+
+
+def iter_task_results(
+    model: DCFModel,
+    tasks: list[dict[str, Any]],
+    inputs: dict[str, np.ndarray] | None = None,
+    workers: int | None = None,
+    max_pending: int | None = None,
+    eval_kwargs: dict[str, Any] | None = None,
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """
+    Evaluate tasks on one process pool and stream each chunk's results.
+
+    The pool and a fixed ring of shared-memory output slots are created once
+    for the whole run, so memory stays bounded by max_pending chunks no matter
+    how many tasks there are. Results are yielded in task order as soon as
+    each chunk is done.
+
+    Args:
+        model: Model with assumptions and WACC set
+        tasks: Chunk tasks (e.g. a subset of monte_carlo_tasks)
+        inputs: Arrays shared read-only with the workers
+        workers: Number of processes (defaults to CPU count)
+        max_pending: Chunks in flight (defaults to 2 per worker)
+        eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Yields:
+        (position in tasks, metric name -> array for that chunk)
+    """
+    inputs = inputs or {}
+    eval_kwargs = eval_kwargs or {}
+    if not tasks:
+        return
+    metrics = _output_metrics(model, eval_kwargs)
+    workers = _resolve_workers(workers, len(tasks))
+    width = max(task["stop"] - task["start"] for task in tasks)
+
+    if workers <= 1:
+        output = np.empty((len(metrics), width))
+        for position, task in enumerate(tasks):
+            size = _evaluate_chunk(model, task, inputs, output, 0, metrics, eval_kwargs)
+            yield position, {metric: output[row, :size].copy() for row, metric in enumerate(metrics)}
+        return
+
+    slots = max(max_pending or 2 * workers, 1)
+    with _worker_pool(model, inputs, (len(metrics), slots * width), workers, metrics, eval_kwargs) as (
+        executor,
+        output,
+    ):
+        # 空きスロットの数だけ先行して投入し、結果を取り出したスロットを再利用する
+        pending: deque[tuple[int, int, Future]] = deque()
+        next_task = 0
+
+        def submit(slot: int):
+            nonlocal next_task
+            if next_task < len(tasks):
+                future = executor.submit(_run_worker_chunk, tasks[next_task], slot * width)
+                pending.append((next_task, slot, future))
+                next_task += 1
+
+        for slot in range(slots):
+            submit(slot)
+        while pending:
+            position, slot, future = pending.popleft()
+            size = future.result()
+            offset = slot * width
+            results = {
+                metric: output[row, offset : offset + size].copy() for row, metric in enumerate(metrics)
+            }
+            submit(slot)
+            yield position, results
+
+
+def run_monte_carlo(
+    model: DCFModel,
+    distributions: dict[str, dict[str, Any]],
+    n_paths: int,
+    seed: int | None = None,
+    workers: int | None = None,
+    chunk_size: int = 65536,
+    **eval_kwargs: Any,
+) -> dict[str, np.ndarray]:
+    """
+    Run a Monte Carlo simulation over the model's drivers on multiple cores.
+
+    Each chunk draws from its own stream spawned from seed, and chunk
+    boundaries depend only on n_paths and chunk_size, so results are identical
+    for any number of workers.
+
+    Args:
+        model: Model with assumptions and WACC set
+        distributions: Driver name -> {"dist": ..., parameters}; supported
+            distributions are normal(mean, std), uniform(low, high),
+            triangular(low, mode, high) and lognormal(mean, sigma)
+        n_paths: Number of simulated paths
+        seed: Root seed for reproducible streams
+        workers: Number of processes (defaults to CPU count)
+        chunk_size: Paths per work unit
+        **eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Returns:
+        Metric name -> array of length n_paths
+    """
+    validate_distributions(distributions)
+    tasks = monte_carlo_tasks(n_paths, chunk_size, seed, distributions)
+    return execute_tasks(model, tasks, {}, n_paths, workers, eval_kwargs)
+
+
+def run_grid(
+    model: DCFModel,
+    axes: dict[str, Sequence[float]],
+    workers: int | None = None,
+    chunk_size: int = 65536,
+    **eval_kwargs: Any,
+) -> dict[str, np.ndarray]:
+    """
+    Evaluate the Cartesian product of driver values on multiple cores.
+
+    Only the axis values are shared with workers; each chunk expands its own
+    slice of the product from flat indices.
+
+    Args:
+        model: Model with assumptions and WACC set
+        axes: Driver name -> values to test
+        workers: Number of processes (defaults to CPU count)
+        chunk_size: Grid points per work unit
+        **eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Returns:
+        Metric name -> array shaped like the grid (axes in the given order)
+    """
+    _validate_drivers(axes)
+    inputs = {name: np.asarray(values, dtype=float) for name, values in axes.items()}
+    shape = tuple(len(values) for values in inputs.values())
+    total = int(np.prod(shape))
+    tasks = [
+        {"kind": "grid", "start": start, "stop": stop, "names": list(inputs)}
+        for start, stop in _chunk_bounds(total, chunk_size)
+    ]
+    results = execute_tasks(model, tasks, inputs, total, workers, eval_kwargs)
+    return {metric: values.reshape(shape) for metric, values in results.items()}
+
+
+def run_scenarios(
+    model: DCFModel,
+    drivers: dict[str, Sequence[float]],
+    workers: int | None = None,
+    chunk_size: int = 65536,
+    **eval_kwargs: Any,
+) -> dict[str, np.ndarray]:
+    """
+    Evaluate explicit scenario arrays (one value per scenario and driver).
+
+    Args:
+        model: Model with assumptions and WACC set
+        drivers: Driver name -> per-scenario values (equal lengths)
+        workers: Number of processes (defaults to CPU count)
+        chunk_size: Scenarios per work unit
+        **eval_kwargs: Passed to DCFModel.evaluate_batch
+
+    Returns:
+        Metric name -> array with one value per scenario
+    """
+    _validate_drivers(drivers)
+    inputs = {name: np.asarray(values, dtype=float) for name, values in drivers.items()}
+    lengths = {len(values) for values in inputs.values()}
+    if len(lengths) != 1:
+        raise ValueError("Scenario driver arrays must have the same length")
+    total = lengths.pop()
+    tasks = [
+        {"kind": "scenarios", "start": start, "stop": stop}
+        for start, stop in _chunk_bounds(total, chunk_size)
+    ]
+    return execute_tasks(model, tasks, inputs, total, workers, eval_kwargs)
+
+
+def summarize_distribution(values: np.ndarray) -> dict[str, float]:
+    """シミュレーション結果の要約統計量を返す"""
+    percentiles = np.percentile(values, [5, 25, 50, 75, 95])
+    return {
+        "mean": float(np.mean(values)),
+        "std": float(np.std(values)),
+        "p5": float(percentiles[0]),
+        "p25": float(percentiles[1]),
+        "p50": float(percentiles[2]),
+        "p75": float(percentiles[3]),
+        "p95": float(percentiles[4]),
+    }
+
+
+if __name__ == "__main__":
+    # 入力JSONの読み込みには一括ローダーの検証ロジックを再利用する
+    from dcf_bulk_loader import load_dcf_input
+
+    parser = argparse.ArgumentParser(description="Parallel DCF Monte Carlo CLI")
+    parser.add_argument("--input", required=True, help="Input JSON file (dcf_model schema)")
+    parser.add_argument(
+        "--distributions",
+        required=True,
+        help='Driver distributions as JSON, e.g. \'{"wacc": {"dist": "normal", "mean": 0.09, "std": 0.01}}\'',
+    )
+    parser.add_argument("--paths", type=int, default=100000, help="Number of simulated paths")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--chunk_size", type=int, default=65536, help="Paths per work unit")
+    parser.add_argument("--checkpoint_dir", default=None, help="Directory for periodic checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Skip chunks completed in the checkpoint")
+    parser.add_argument("--overwrite", action="store_true", help="Discard an existing checkpoint and start over")
+
+    args = parser.parse_args()
+
+    inputs = load_dcf_input(args.input)
+    model = build_dcf_model(inputs)
+
+    if args.checkpoint_dir:
+        # パスは保持せず、モーメントとヒストグラムで集計しながらチェックポイントを取る
+        from dcf_checkpoint import CheckpointStore, run_monte_carlo_with_checkpoints
+
+        metrics = run_monte_carlo_with_checkpoints(
+            model,
+            json.loads(args.distributions),
+            n_paths=args.paths,
+            checkpoint_dir=args.checkpoint_dir,
+            seed=args.seed,
+            resume=args.resume,
+            overwrite=args.overwrite,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            net_debt=inputs.net_debt,
+            shares_outstanding=inputs.shares,
+        )
+        # シード未指定時は生成されたシード (再開時は保存済みのシード) を報告する
+        seed = CheckpointStore.read_manifest(args.checkpoint_dir)["config"]["seed"]
+    else:
+        # シード未指定時もここで生成して出力に含め、結果を再現できるようにする
+        seed = args.seed if args.seed is not None else int(np.random.SeedSequence().entropy)
+        results = run_monte_carlo(
+            model,
+            json.loads(args.distributions),
+            n_paths=args.paths,
+            seed=seed,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            net_debt=inputs.net_debt,
+            shares_outstanding=inputs.shares,
+        )
+        metrics = {metric: summarize_distribution(values) for metric, values in results.items()}
+
+    output = {
+        "company_name": model.company_name,
+        "paths": args.paths,
+        "seed": seed,
+        "metrics": metrics,
+    }
+    print(json.dumps(output, indent=2))
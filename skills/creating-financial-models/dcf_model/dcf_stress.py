@@ -0,0 +1,239 @@
+"""
+Companies x scenarios stress-test kernel.
+Applies a set of macro scenario shocks (WACC-component and assumption deltas)
+to every company baseline and values the full C x S matrix in chunked,
+broadcast batches instead of a nested loop of DCFModel runs.
+"""
+
+import argparse
+import json
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+# dcf_model.py からベクトル化カーネルをインポート (同じディレクトリにある前提)
+from dcf_model import calculate_wacc_batch, equity_bridge, evaluate_dcf_batch
+
+# シナリオで加算ショックを与えられる項目 (WACC構成要素と前提条件)
+SHOCK_FIELDS = (
+    "risk_free_rate",
+    "beta",
+    "market_premium",
+    "cost_of_debt",
+    "debt_to_equity",
+    "revenue_growth",
+    "ebitda_margin",
+    "tax_rate",
+    "terminal_growth",
+)
+
+STRESS_METRICS = ("wacc", "enterprise_value", "equity_value", "value_per_share")
+
+
+def _expand(values: Any, years: int, default: float) -> np.ndarray:
+    # run_dcf_analysis と同じく、1つの値なら全期間一定として扱う
+    if values is None:
+        return np.full(years, default)
+    values = list(values)
+    if len(values) == 1:
+        return np.full(years, float(values[0]))
+    if len(values) < years:
+        raise ValueError(f"Expected {years} values, got {len(values)}")
+    return np.asarray(values[:years], dtype=float)
+
+
+def stack_baselines(companies: Sequence[argparse.Namespace]) -> dict[str, np.ndarray]:
+    """
+    Stack company inputs into column arrays for the stress kernel.
+
+    Args:
+        companies: run_dcf_analysis arguments (e.g. from dcf_bulk_loader) sharing
+            the same projection_years
+
+    Returns:
+        Per-company arrays; per-year fields have shape (C, T)
+    """
+    if not companies:
+        raise ValueError("At least one company is required")
+    years = {args.years for args in companies}
+    if len(years) != 1:
+        raise ValueError("All companies must share projection_years; group them first")
+    years = years.pop()
+
+    def column(values: list[float]) -> np.ndarray:
+        return np.asarray(values, dtype=float)
+
+    return {
+        "base_revenue": column([args.hist_revenue[-1] for args in companies]),
+        "revenue_growth": np.stack([_expand(args.growth, years, 0.10) for args in companies]),
+        "ebitda_margin": np.stack([_expand(args.margin, years, 0.20) for args in companies]),
+        "capex_percent": np.stack(
+            [_expand(getattr(args, "capex_percent", None), years, 0.05) for args in companies]
+        ),
+        "nwc_percent": np.stack(
+            [_expand(getattr(args, "nwc_percent", None), years, 0.10) for args in companies]
+        ),
+        "tax_rate": column([args.tax_rate for args in companies]),
+        "terminal_growth": column([args.terminal_growth for args in companies]),
+        "risk_free_rate": column([args.rf for args in companies]),
+        "beta": column([args.beta for args in companies]),
+        "market_premium": column([args.erp for args in companies]),
+        "cost_of_debt": column([args.cost_debt for args in companies]),
+        "debt_to_equity": column([args.debt_equity for args in companies]),
+        "net_debt": column([args.net_debt for args in companies]),
+        "shares": column([args.shares for args in companies]),
+    }
+
+
+def stack_scenarios(scenarios: Sequence[dict[str, float]]) -> dict[str, np.ndarray]:
+    """
+    Convert scenario shock dicts into per-field delta arrays of length S.
+
+    Args:
+        scenarios: Field (see SHOCK_FIELDS) -> additive delta; omitted fields are 0
+
+    Returns:
+        Field -> array of deltas
+    """
+    if not scenarios:
+        raise ValueError("At least one scenario is required")
+    for scenario in scenarios:
+        unknown = set(scenario) - set(SHOCK_FIELDS) - {"name"}
+        if unknown:
+            raise ValueError(f"Unknown shock fields: {sorted(unknown)}; expected {SHOCK_FIELDS}")
+    return {
+        field: np.asarray([float(scenario.get(field, 0.0)) for scenario in scenarios])
+        for field in SHOCK_FIELDS
+    }
+
+
+def _stress_group(
+    companies: Sequence[argparse.Namespace],
+    shocks: dict[str, np.ndarray],
+    chunk_size: int,
+) -> dict[str, np.ndarray]:
+    """同じ予測年数の会社群について (C, S) の評価行列を計算する"""
+    base = stack_baselines(companies)
+    n_companies, n_scenarios = len(companies), len(shocks["tax_rate"])
+
+    outputs = {metric: np.empty((n_companies, n_scenarios)) for metric in STRESS_METRICS}
+
+    for start in range(0, n_companies, chunk_size):
+        rows = slice(start, min(start + chunk_size, n_companies))
+
+        # 会社 (c, 1) とシナリオ (1, s) をブロードキャストして (c, s) の行列を得る
+        def shocked(field: str) -> np.ndarray:
+            return base[field][rows, None] + shocks[field][None, :]
+
+        tax_rate = shocked("tax_rate")
+        wacc = calculate_wacc_batch(
+            shocked("risk_free_rate"),
+            shocked("beta"),
+            shocked("market_premium"),
+            shocked("cost_of_debt"),
+            shocked("debt_to_equity"),
+            tax_rate,
+        )
+        results = evaluate_dcf_batch(
+            base_revenue=base["base_revenue"][rows, None],
+            revenue_growth=base["revenue_growth"][rows, None, :]
+            + shocks["revenue_growth"][None, :, None],
+            ebitda_margin=base["ebitda_margin"][rows, None, :]
+            + shocks["ebitda_margin"][None, :, None],
+            capex_percent=base["capex_percent"][rows, None, :],
+            nwc_percent=base["nwc_percent"][rows, None, :],
+            tax_rate=tax_rate,
+            wacc=wacc,
+            terminal_growth=shocked("terminal_growth"),
+        )
+        equity = equity_bridge(
+            results["enterprise_value"], base["net_debt"][rows, None], base["shares"][rows, None]
+        )
+
+        outputs["wacc"][rows] = wacc
+        outputs["enterprise_value"][rows] = results["enterprise_value"]
+        outputs["equity_value"][rows] = equity["equity_value"]
+        outputs["value_per_share"][rows] = equity["value_per_share"]
+
+    return outputs
+
+
+def stress_test(
+    companies: Sequence[argparse.Namespace],
+    scenarios: Sequence[dict[str, float]],
+    chunk_size: int = 1024,
+) -> dict[str, np.ndarray]:
+    """
+    Value every company under every scenario.
+
+    Companies are grouped by projection_years and processed in chunks of
+    chunk_size; within a chunk the (companies, scenarios, years) computation is
+    a single broadcast pass. WACC is recomputed from the shocked components;
+    growth and margin deltas apply to every projection year.
+
+    Args:
+        companies: run_dcf_analysis arguments (e.g. from dcf_bulk_loader)
+        scenarios: Shock dicts (an optional "name" key is ignored)
+        chunk_size: Companies per broadcast batch
+
+    Returns:
+        (C, S) arrays of wacc, enterprise_value, equity_value and value_per_share
+    """
+    if not companies:
+        raise ValueError("At least one company is required")
+    shocks = stack_scenarios(scenarios)
+
+    groups: dict[int, list[int]] = {}
+    for index, args in enumerate(companies):
+        groups.setdefault(args.years, []).append(index)
+
+    outputs = {metric: np.empty((len(companies), len(scenarios))) for metric in STRESS_METRICS}
+    for indices in groups.values():
+        group_outputs = _stress_group([companies[i] for i in indices], shocks, chunk_size)
+        for metric, values in group_outputs.items():
+            outputs[metric][indices] = values
+    return outputs
+
+
+if __name__ == "__main__":
+    # 入力JSONの読み込みには一括ローダーを再利用する
+    from dcf_bulk_loader import expand_input_paths, iter_input_batches
+
+    parser = argparse.ArgumentParser(description="Companies x Scenarios Stress Test CLI")
+    parser.add_argument("inputs", nargs="+", help="Input JSON files or directories (dcf_model schema)")
+    parser.add_argument(
+        "--scenarios",
+        required=True,
+        help='Scenario JSON file: [{"name": "rates+100bp", "risk_free_rate": 0.01}, ...]',
+    )
+    parser.add_argument("--chunk_size", type=int, default=1024, help="Companies per broadcast batch")
+
+    args = parser.parse_args()
+
+    with open(args.scenarios, encoding="utf-8") as f:
+        scenario_list = json.load(f)
+
+    input_paths = expand_input_paths(args.inputs)
+    companies = [
+        entry["args"]
+        for batch in iter_input_batches(input_paths, strict=True)
+        for entry in batch
+    ]
+    results = stress_test(companies, scenario_list, chunk_size=args.chunk_size)
+
+    # 1行1社の JSON Lines で、シナリオごとの企業価値と1株当たり価値を出力
+    names = [scenario.get("name", f"scenario_{j}") for j, scenario in enumerate(scenario_list)]
+    for i, company in enumerate(companies):
+        record = {
+            "company_name": company.company,
+            "scenarios": {
+                name: {
+                    "enterprise_value": round(float(results["enterprise_value"][i, j]), 2),
+                    "value_per_share": round(float(results["value_per_share"][i, j]), 2),
+                    "wacc": round(float(results["wacc"][i, j]), 4),
+                }
+                for j, name in enumerate(names)
+            },
+        }
+        print(json.dumps(record, ensure_ascii=False))
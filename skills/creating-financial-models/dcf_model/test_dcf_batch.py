@@ -0,0 +1,95 @@
+"""
+Consistency checks between the vectorized batch kernel and the scalar DCFModel.
+Run with: uv run --link-mode=copy pytest test_dcf_batch.py
+"""
+
+import numpy as np
+import pytest
+
+# dcf_model.py から DCFModel をインポート (同じディレクトリにある前提)
+from dcf_model import BATCH_DRIVERS, DCFModel
+
+DRIVER_VALUES = {
+    "wacc": [0.08, 0.11],
+    "terminal_growth": [0.02, 0.035],
+    "revenue_growth": [0.10, 0.05],
+    "ebitda_margin": [0.22, 0.30],
+    "tax_rate": [0.20, 0.30],
+    "capex_percent": [0.03, 0.07],
+    "nwc_percent": [0.08, 0.15],
+}
+
+
+def _base_model() -> DCFModel:
+    model = DCFModel("Test Co")
+    model.set_historical_financials(
+        revenue=[800, 900, 1000],
+        ebitda=[160, 185, 210],
+        capex=[40, 45, 50],
+        nwc=[80, 90, 100],
+        years=[2021, 2022, 2023],
+    )
+    model.set_assumptions(
+        projection_years=5,
+        revenue_growth=[0.12, 0.11, 0.10, 0.09, 0.08],
+        ebitda_margin=[0.21, 0.22, 0.23, 0.24, 0.25],
+        terminal_growth=0.03,
+    )
+    model.calculate_wacc(0.04, 1.2, 0.06, 0.05, 0.4)
+    return model
+
+
+def _scalar_value(model: DCFModel, driver: str, value: float) -> float:
+    """1つのドライバーを単体モデルに設定して企業価値を計算する"""
+    model = model.fork()
+    years = model.assumptions.projection_years
+    if driver == "wacc":
+        model.wacc_components.wacc = value
+    elif driver == "terminal_growth":
+        model.assumptions.terminal_growth = value
+    elif driver == "tax_rate":
+        model.assumptions.tax_rate = value
+    else:
+        model.assumptions[driver] = np.full(years, value)
+    model.project_cash_flows()
+    return model.calculate_enterprise_value().enterprise_value
+
+
+def test_driver_values_cover_batch_drivers():
+    assert set(DRIVER_VALUES) == set(BATCH_DRIVERS)
+
+
+def test_evaluate_batch_without_drivers_matches_scalar():
+    model = _base_model()
+    model.project_cash_flows()
+    expected = model.calculate_enterprise_value().enterprise_value
+    np.testing.assert_allclose(model.evaluate_batch()["enterprise_value"], expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("driver", BATCH_DRIVERS)
+def test_evaluate_batch_matches_scalar_per_driver(driver):
+    model = _base_model()
+    values = DRIVER_VALUES[driver]
+    batch = model.evaluate_batch({driver: values})["enterprise_value"]
+    expected = [_scalar_value(model, driver, value) for value in values]
+    np.testing.assert_allclose(batch, expected, rtol=1e-12)
+
+
+def test_evaluate_batch_keeps_horizon_when_all_per_year_drivers_given():
+    model = _base_model()
+    per_year = ("revenue_growth", "ebitda_margin", "capex_percent", "nwc_percent")
+    drivers = {name: DRIVER_VALUES[name][:1] for name in per_year}
+    batch = model.evaluate_batch(drivers)["enterprise_value"]
+
+    scalar = model.fork()
+    scalar.set_assumptions(
+        projection_years=5,
+        revenue_growth=[0.10] * 5,
+        ebitda_margin=[0.22] * 5,
+        capex_percent=[0.03] * 5,
+        nwc_percent=[0.08] * 5,
+        terminal_growth=0.03,
+    )
+    scalar.wacc_components = model.wacc_components.copy()
+    scalar.project_cash_flows()
+    np.testing.assert_allclose(batch, [scalar.calculate_enterprise_value().enterprise_value], rtol=1e-12)
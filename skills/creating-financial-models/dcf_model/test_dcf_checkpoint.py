@@ -0,0 +1,166 @@
+"""
+Checkpoint, resume and atomic commit checks for dcf_checkpoint.
+Run with: uv run --link-mode=copy pytest test_dcf_checkpoint.py
+"""
+
+import json
+import os
+
+import pytest
+
+# dcf_model.py と同じディレクトリにある前提
+import dcf_checkpoint
+import dcf_parallel
+from dcf_checkpoint import CheckpointStore, run_monte_carlo_with_checkpoints, run_portfolio_with_checkpoints
+from dcf_model import DCFModel
+
+DISTRIBUTIONS = {
+    "wacc": {"dist": "normal", "mean": 0.09, "std": 0.01},
+    "revenue_growth": {"dist": "uniform", "low": 0.04, "high": 0.12},
+}
+
+COMPANY = {
+    "historical_financials": {
+        "years": [2022, 2023],
+        "revenue": [900, 1000],
+        "ebitda": [180, 200],
+        "capex": [40, 50],
+        "nwc": [90, 100],
+    },
+    "assumptions": {"projection_years": 5, "revenue_growth": [0.1], "ebitda_margin": [0.2]},
+    "wacc_parameters": {
+        "risk_free_rate": 0.04,
+        "beta": 1.2,
+        "market_premium": 0.06,
+        "cost_of_debt": 0.05,
+        "debt_to_equity": 0.5,
+    },
+    "equity_params": {"net_debt": 100, "shares_outstanding": 20},
+}
+
+
+def _base_model() -> DCFModel:
+    model = DCFModel("Test Co")
+    model.set_historical_financials(
+        revenue=[800, 900, 1000],
+        ebitda=[160, 185, 210],
+        capex=[40, 45, 50],
+        nwc=[80, 90, 100],
+        years=[2021, 2022, 2023],
+    )
+    model.set_assumptions(
+        projection_years=5,
+        revenue_growth=[0.12, 0.11, 0.10, 0.09, 0.08],
+        ebitda_margin=[0.21, 0.22, 0.23, 0.24, 0.25],
+        terminal_growth=0.03,
+    )
+    model.calculate_wacc(0.04, 1.2, 0.06, 0.05, 0.4)
+    return model
+
+
+def _run_mc(directory, **kwargs):
+    return run_monte_carlo_with_checkpoints(
+        _base_model(),
+        DISTRIBUTIONS,
+        n_paths=5000,
+        checkpoint_dir=str(directory),
+        seed=7,
+        chunk_size=500,
+        chunks_per_checkpoint=3,
+        workers=1,
+        bins=256,
+        **kwargs,
+    )
+
+
+def _write_company(directory, name: str) -> str:
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"company_name": name, **COMPANY}, f)
+    return path
+
+
+def test_commit_is_atomic_when_manifest_write_fails(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path), {"kind": "test"})
+    store.commit({"a": 1}, {"total": 1})
+
+    real_write = dcf_checkpoint._atomic_write
+
+    def fail_on_manifest(path, text):
+        if path.endswith(dcf_checkpoint.MANIFEST_FILE):
+            raise OSError("disk full")
+        real_write(path, text)
+
+    # セグメントは書けたがマニフェストの置き換え前に落ちたケース
+    monkeypatch.setattr(dcf_checkpoint, "_atomic_write", fail_on_manifest)
+    with pytest.raises(OSError):
+        store.commit({"b": 2}, {"total": 3})
+    monkeypatch.undo()
+
+    resumed = CheckpointStore(str(tmp_path), {"kind": "test"}, resume=True)
+    assert resumed.completed == {"a"}
+    assert resumed.aggregates == {"total": 1}
+    assert list(resumed.iter_results()) == [("a", 1)]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_existing_checkpoint_requires_resume_or_overwrite(tmp_path):
+    CheckpointStore(str(tmp_path), {"kind": "test"}).commit({"a": 1})
+
+    with pytest.raises(FileExistsError):
+        CheckpointStore(str(tmp_path), {"kind": "test"})
+
+    store = CheckpointStore(str(tmp_path), {"kind": "test"}, overwrite=True)
+    assert store.completed == set()
+    assert CheckpointStore.read_manifest(str(tmp_path)) is None
+
+
+def test_monte_carlo_resume_after_interruption_matches_uninterrupted_run(tmp_path, monkeypatch):
+    expected = _run_mc(tmp_path / "full")
+
+    real_evaluate = dcf_parallel._evaluate_chunk
+    calls = []
+
+    def interrupt_midway(*args, **kwargs):
+        # 2回目のコミットと3回目のコミットの間で中断する
+        if len(calls) == 7:
+            raise KeyboardInterrupt
+        calls.append(1)
+        return real_evaluate(*args, **kwargs)
+
+    monkeypatch.setattr(dcf_parallel, "_evaluate_chunk", interrupt_midway)
+    with pytest.raises(KeyboardInterrupt):
+        _run_mc(tmp_path / "resumed")
+    monkeypatch.undo()
+
+    manifest = CheckpointStore.read_manifest(str(tmp_path / "resumed"))
+    assert len(manifest["completed"]) == 6
+
+    assert _run_mc(tmp_path / "resumed", resume=True) == expected
+
+
+def test_portfolio_resume_retries_failures_without_rerunning_successes(tmp_path, monkeypatch):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    ok = _write_company(inputs, "ok")
+    late = os.path.join(inputs, "late.json")
+    checkpoint = str(tmp_path / "checkpoint")
+
+    first = list(run_portfolio_with_checkpoints([ok, late], checkpoint))
+    assert "result" in first[0] and "error" in first[1]
+
+    valued = []
+    real_analysis = dcf_checkpoint.run_dcf_analysis
+
+    def counting_analysis(args):
+        valued.append(args.company)
+        return real_analysis(args)
+
+    monkeypatch.setattr(dcf_checkpoint, "run_dcf_analysis", counting_analysis)
+    _write_company(inputs, "late")
+    second = list(run_portfolio_with_checkpoints([ok, late], checkpoint, resume=True))
+
+    assert valued == ["late"]
+    assert [record["path"] for record in second] == [ok, late]
+    assert all("result" in record for record in second)
+    assert second[0] == first[0]
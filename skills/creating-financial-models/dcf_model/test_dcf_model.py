@@ -0,0 +1,40 @@
+"""
+State validation checks for DCFModel records.
+Run with: uv run --link-mode=copy pytest test_dcf_model.py
+"""
+
+import pytest
+
+# dcf_model.py から DCFModel をインポート (同じディレクトリにある前提)
+from dcf_model import DCFModel
+
+
+def _model() -> DCFModel:
+    model = DCFModel("Test Co")
+    model.set_assumptions(projection_years=5, revenue_growth=[0.10] * 5, ebitda_margin=[0.20] * 5)
+    return model
+
+
+def test_extending_projection_years_rejects_short_series():
+    model = _model()
+    with pytest.raises(ValueError, match="projection_years"):
+        model.assumptions["projection_years"] = 10
+    assert model.assumptions.projection_years == 5
+
+
+def test_shortening_projection_years_truncates_series():
+    model = _model()
+    model.assumptions["projection_years"] = 3
+    assert len(model.assumptions.revenue_growth) == 3
+    assert len(model.assumptions.nwc_percent) == 3
+
+
+def test_series_require_projection_years():
+    with pytest.raises(ValueError, match="projection_years must be set"):
+        DCFModel().assumptions["ebitda_margin"] = [0.2] * 3
+
+
+def test_short_series_rejected():
+    model = _model()
+    with pytest.raises(ValueError, match="needs 5 values"):
+        model.assumptions["ebitda_margin"] = [0.2] * 3
@@ -6,6 +6,7 @@ Tests impact of variable changes on key outputs.
 import argparse
 import json
 import sys
+from collections import OrderedDict
 from collections.abc import Callable
 from typing import Any
 
@@ -29,10 +30,57 @@ except ImportError:
 class SensitivityAnalyzer:
     """Perform sensitivity analysis on financial models."""
 
-    def __init__(self, base_model: Any):
+    def __init__(self, base_model: Any, cache_size: int = 4096):
+        """
+        Args:
+            base_model: Model mutated by the update functions
+            cache_size: Maximum memoized evaluations (0 disables memoization)
+
+        Outputs are memoized per output_func on base_model.state_fingerprint(),
+        so output functions must depend only on the base model's state.
+        Models without state_fingerprint are always re-evaluated.
+        """
         self.base_model = base_model
         self.base_output = None
         self.sensitivity_results = {}
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[Any, bytes], Any] = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def evaluate(self, output_func: Callable) -> Any:
+        """現在のモデル状態で output_func を評価する (同じ状態の再評価はメモから返す)"""
+        fingerprint = getattr(self.base_model, "state_fingerprint", None)
+        if self.cache_size <= 0 or fingerprint is None:
+            return output_func()
+
+        key = (output_func, fingerprint())
+        if key in self._cache:
+            self._cache_hits += 1
+            self._cache.move_to_end(key)
+            output = self._cache[key]
+        else:
+            self._cache_misses += 1
+            output = output_func()
+            self._cache[key] = output
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        # 呼び出し側が辞書を書き換えてもメモが壊れないようにコピーを返す
+        return dict(output) if isinstance(output, dict) else output
+
+    def cache_info(self) -> dict[str, int]:
+        """メモのヒット/ミス統計を返す"""
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "size": len(self._cache),
+            "maxsize": self.cache_size,
+        }
+
+    def cache_clear(self):
+        self._cache.clear()
+        self._cache_hits = 0
+        self._cache_misses = 0
 
     def one_way_sensitivity(
         self,
@@ -49,20 +97,24 @@ class SensitivityAnalyzer:
 
         results = []
         # Store original output for comparison
-        base_output_val = output_func()
+        base_output_val = self.evaluate(output_func)
+        base_outputs = _metric_outputs(base_output_val)
 
         for value in test_values:
             model_update_func(value)
-            output = output_func()
-            results.append(
-                {
+            # output_func が辞書を返す場合は1回の評価で全指標を取り出す
+            outputs = _metric_outputs(self.evaluate(output_func))
+            for metric, output in outputs.items():
+                row = {
                     "variable": variable_name,
                     "value": value,
                     "pct_change": (value - base_value) / base_value * 100 if base_value != 0 else 0,
                     "output": output,
-                    "output_change": output - base_output_val,
+                    "output_change": output - base_outputs[metric],
                 }
-            )
+                if metric is not None:
+                    row = {"metric": metric, **row}
+                results.append(row)
 
         # Reset to base
         model_update_func(base_value)
@@ -71,25 +123,28 @@ class SensitivityAnalyzer:
     def tornado_analysis(
         self, variables: dict[str, dict[str, Any]], output_func: Callable
     ) -> pd.DataFrame:
-        self.base_output = output_func()
+        self.base_output = self.evaluate(output_func)
+        base_outputs = _metric_outputs(self.base_output)
         tornado_data = []
 
         for var_name, var_info in variables.items():
             # Test low
             var_info["update_func"](var_info["low"])
-            low_output = output_func()
+            low_outputs = _metric_outputs(self.evaluate(output_func))
 
             # Test high
             var_info["update_func"](var_info["high"])
-            high_output = output_func()
+            high_outputs = _metric_outputs(self.evaluate(output_func))
 
             # Reset
             var_info["update_func"](var_info["base"])
 
-            impact = high_output - low_output
-            
-            tornado_data.append(
-                {
+            for metric, base_output in base_outputs.items():
+                low_output = low_outputs[metric]
+                high_output = high_outputs[metric]
+                impact = high_output - low_output
+
+                row = {
                     "variable": var_name,
                     "base_value": var_info["base"],
                     "low_value": var_info["low"],
@@ -97,22 +152,282 @@ class SensitivityAnalyzer:
                     "low_output": low_output,
                     "high_output": high_output,
                     "impact": abs(impact),
-                    "impact_pct": abs(impact) / self.base_output * 100 if self.base_output != 0 else 0,
+                    "impact_pct": abs(impact) / base_output * 100 if base_output != 0 else 0,
                 }
-            )
+                if metric is not None:
+                    row = {"metric": metric, **row}
+                tornado_data.append(row)
 
         df = pd.DataFrame(tornado_data)
+        if "metric" in df:
+            # 指標ごとに影響度の大きい順に並べる
+            return df.sort_values(["metric", "impact"], ascending=[True, False], kind="stable")
         return df.sort_values("impact", ascending=False)
 
+    def adaptive_one_way_sensitivity(
+        self,
+        variable_name: str,
+        min_value: float,
+        max_value: float,
+        base_value: float,
+        output_func: Callable,
+        model_update_func: Callable,
+        contour_levels: list[float] | None = None,
+        initial_steps: int = 5,
+        output_tol: float | None = None,
+        max_depth: int = 8,
+        max_evaluations: int = 200,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Coarse-to-fine one-way sensitivity.
+
+        Intervals are bisected only where the output crosses one of
+        contour_levels or where a sample deviates from the straight line through
+        its neighbours by more than output_tol (curvature), down to max_depth
+        halvings of the initial step. output_tol defaults to 1% of the coarse
+        output range without contour_levels and to 0 (off) with them. Returns
+        irregular samples plus the interpolated variable values where the
+        output equals each contour level. output_func must return a single value.
+        """
+        contour_levels = list(contour_levels or [])
+        cache: dict[float, float] = {}
+
+        def evaluate(x: float) -> float:
+            if x not in cache:
+                model_update_func(x)
+                cache[x] = self.evaluate(output_func)
+            return cache[x]
+
+        for x in np.linspace(min_value, max_value, max(initial_steps, 2)):
+            evaluate(float(x))
+
+        if output_tol is None:
+            # 既定値: 等高線指定時は曲率による細分化を行わず、それ以外は初期グリッドの出力レンジの1%
+            output_tol = 0.0 if contour_levels else 0.01 * (max(cache.values()) - min(cache.values()))
+        min_width = (max_value - min_value) / (max(initial_steps, 2) - 1) / 2**max_depth
+
+        while len(cache) < max_evaluations:
+            xs = sorted(cache)
+            ys = [cache[x] for x in xs]
+            # 両隣を結ぶ直線からのずれが大きい点の左右の区間を細分化対象にする
+            curved = set()
+            if output_tol > 0:
+                for i in range(1, len(xs) - 1):
+                    deviation = _linear_deviation(
+                        xs[i - 1], ys[i - 1], xs[i], ys[i], xs[i + 1], ys[i + 1]
+                    )
+                    if deviation > output_tol:
+                        curved.update([i - 1, i])
+            midpoints = []
+            for i, (x0, x1) in enumerate(zip(xs[:-1], xs[1:])):
+                if x1 - x0 <= min_width * (1 + 1e-9):
+                    continue
+                if i in curved or _crosses_level(ys[i], ys[i + 1], contour_levels):
+                    midpoints.append((x0 + x1) / 2)
+            if not midpoints:
+                break
+            for x in midpoints[: max_evaluations - len(cache)]:
+                evaluate(x)
+
+        model_update_func(base_value)
+
+        xs = sorted(cache)
+        samples = pd.DataFrame(
+            {"variable": variable_name, "value": xs, "output": [cache[x] for x in xs]}
+        )
+        contours = []
+        for level in contour_levels:
+            for x0, x1 in zip(xs[:-1], xs[1:]):
+                point = _interpolate_crossing(x0, cache[x0], x1, cache[x1], level)
+                if point is not None:
+                    contours.append({"level": level, "value": point})
+            if cache[xs[-1]] == level:
+                contours.append({"level": level, "value": xs[-1]})
+        return {
+            "samples": samples,
+            "contours": pd.DataFrame(contours, columns=["level", "value"]),
+        }
+
+    def adaptive_two_way_sensitivity(
+        self,
+        var1: dict[str, Any],
+        var2: dict[str, Any],
+        output_func: Callable,
+        contour_levels: list[float] | None = None,
+        initial_steps: int = 5,
+        output_tol: float | None = None,
+        max_depth: int = 5,
+        max_evaluations: int = 2000,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Quadtree-refined two-way sensitivity.
+
+        var1 and var2 take the keys "name", "min", "max", "base" and
+        "update_func". Cells are split into quadrants while their corner outputs
+        straddle a contour level or the output at the cell centre deviates from
+        the bilinear interpolation of the corners by more than output_tol
+        (curvature). output_tol defaults to 1% of the coarse output range
+        without contour_levels and to 0 (off) with them. Returns the irregular
+        samples and contour points interpolated along cell edges.
+        output_func must return a single value.
+        """
+        contour_levels = list(contour_levels or [])
+        cache: dict[tuple[float, float], float] = {}
+
+        def evaluate(x: float, y: float) -> float:
+            if (x, y) not in cache:
+                var1["update_func"](x)
+                var2["update_func"](y)
+                cache[(x, y)] = self.evaluate(output_func)
+            return cache[(x, y)]
+
+        steps = max(initial_steps, 2)
+        xs = [float(x) for x in np.linspace(var1["min"], var1["max"], steps)]
+        ys = [float(y) for y in np.linspace(var2["min"], var2["max"], steps)]
+        for x in xs:
+            for y in ys:
+                evaluate(x, y)
+
+        if output_tol is None:
+            output_tol = 0.0 if contour_levels else 0.01 * (max(cache.values()) - min(cache.values()))
+
+        # (x0, x1, y0, y1) のセルを幅優先で細分化し、評価予算を粗い階層から使う
+        level_cells = [
+            (x0, x1, y0, y1)
+            for x0, x1 in zip(xs[:-1], xs[1:])
+            for y0, y1 in zip(ys[:-1], ys[1:])
+        ]
+        leaves = []
+        for depth in range(max_depth + 1):
+            next_cells = []
+            for cell in level_cells:
+                x0, x1, y0, y1 = cell
+                corners = [cache[(x0, y0)], cache[(x1, y0)], cache[(x0, y1)], cache[(x1, y1)]]
+                needs_split = any(min(corners) < level < max(corners) for level in contour_levels)
+                if (
+                    not needs_split
+                    and output_tol > 0
+                    and depth < max_depth
+                    and len(cache) + 5 <= max_evaluations
+                ):
+                    # セル中心を評価し、四隅の双線形補間 (= 平均) からのずれで曲率を判定する
+                    center = evaluate((x0 + x1) / 2, (y0 + y1) / 2)
+                    needs_split = abs(center - sum(corners) / 4) > output_tol
+                if depth == max_depth or not needs_split or len(cache) + 5 > max_evaluations:
+                    leaves.append(cell)
+                    continue
+                xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+                for point in [(xm, y0), (x0, ym), (xm, ym), (x1, ym), (xm, y1)]:
+                    evaluate(*point)
+                next_cells.extend(
+                    [(x0, xm, y0, ym), (xm, x1, y0, ym), (x0, xm, ym, y1), (xm, x1, ym, y1)]
+                )
+            level_cells = next_cells
+            if not level_cells:
+                break
+
+        var1["update_func"](var1["base"])
+        var2["update_func"](var2["base"])
+
+        points = sorted(cache)
+        samples = pd.DataFrame(
+            {
+                var1["name"]: [p[0] for p in points],
+                var2["name"]: [p[1] for p in points],
+                "output": [cache[p] for p in points],
+            }
+        )
+
+        contours = set()
+        for x0, x1, y0, y1 in leaves:
+            edges = [
+                ((x0, y0), (x1, y0)),
+                ((x0, y1), (x1, y1)),
+                ((x0, y0), (x0, y1)),
+                ((x1, y0), (x1, y1)),
+            ]
+            for level in contour_levels:
+                for a, b in edges:
+                    t = _interpolate_crossing(0.0, cache[a], 1.0, cache[b], level)
+                    if t is not None:
+                        contours.add(
+                            (level, a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1]))
+                        )
+        return {
+            "samples": samples,
+            "contours": pd.DataFrame(
+                sorted(contours), columns=["level", var1["name"], var2["name"]]
+            ),
+        }
+
+
+def _metric_outputs(output: Any) -> dict[str | None, float]:
+    """output_func の戻り値を {指標名: 値} に揃える (単一値の場合はキー None)"""
+    if isinstance(output, dict):
+        return output
+    return {None: output}
+
+
+def _crosses_level(y0: float, y1: float, levels: list[float]) -> bool:
+    """区間 [y0, y1] の内側に等高線レベルがあるか"""
+    low, high = min(y0, y1), max(y0, y1)
+    return any(low < level < high for level in levels)
+
+
+def _linear_deviation(
+    x0: float, y0: float, x1: float, y1: float, x2: float, y2: float
+) -> float:
+    """(x1, y1) が (x0, y0)-(x2, y2) を結ぶ直線からどれだけずれているか"""
+    return abs(y1 - (y0 + (y2 - y0) * (x1 - x0) / (x2 - x0)))
+
+
+def _interpolate_crossing(
+    x0: float, y0: float, x1: float, y1: float, level: float
+) -> float | None:
+    """y が level を横切る x を線形補間で求める (右端は含まない)"""
+    if y0 == level:
+        return x0
+    if (y0 - level) * (y1 - level) >= 0:
+        return None
+    return x0 + (level - y0) * (x1 - x0) / (y1 - y0)
+
 
 # --- ヘルパー関数: 文字列からモデル操作へのマッピング ---
 
-def get_output_metric(model: DCFModel, metric_name: str = "enterprise_value") -> float:
-    """モデルの状態から指定された指標を取り出す"""
-    # 再計算を実行
+OUTPUT_METRICS = ["enterprise_value", "equity_value", "value_per_share", "terminal_percent"]
+
+
+def get_output_metrics(
+    model: DCFModel,
+    metrics: list[str] | None = None,
+    net_debt: float = 0.0,
+    shares_outstanding: float = 100.0,
+    cash: float = 0.0,
+) -> dict[str, float]:
+    """1回の再計算でモデルから複数の指標をまとめて取り出す"""
+    metrics = metrics or OUTPUT_METRICS
+    unknown = [metric for metric in metrics if metric not in OUTPUT_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {unknown}; expected {OUTPUT_METRICS}")
+    # 再計算を実行 (予測・割引・株式価値ブリッジを各1回)
     model.project_cash_flows()
     results = model.calculate_enterprise_value()
-    return results.get(metric_name, 0.0)
+    if any(metric in ("equity_value", "value_per_share") for metric in metrics):
+        model.calculate_equity_value(
+            net_debt=net_debt, cash=cash, shares_outstanding=shares_outstanding
+        )
+        results = model.valuation_results
+    return {metric: results[metric] for metric in metrics}
+
+
+def get_output_metric(
+    model: DCFModel,
+    metric_name: str = "enterprise_value",
+    net_debt: float = 0.0,
+    shares_outstanding: float = 100.0,
+) -> float:
+    """モデルの状態から指定された指標を取り出す"""
+    return get_output_metrics(model, [metric_name], net_debt, shares_outstanding)[metric_name]
 
 def update_model_variable(model: DCFModel, var_name: str, value: float):
     """変数名に応じてモデルを更新する"""
@@ -163,8 +478,13 @@ def run_sensitivity_cli(args: argparse.Namespace) -> dict[str, Any]:
     # Analyzer初期化
     analyzer = SensitivityAnalyzer(model)
 
-    # 出力指標を取り出す関数
-    output_func = lambda: get_output_metric(model, "enterprise_value")
+    # 出力指標を取り出す関数 (複数指標の場合は1回の評価でまとめて取り出す)
+    metrics = args.metrics
+    equity_kwargs = {"net_debt": args.net_debt, "shares_outstanding": args.shares}
+    if len(metrics) == 1:
+        output_func = lambda: get_output_metric(model, metrics[0], **equity_kwargs)
+    else:
+        output_func = lambda: get_output_metrics(model, metrics, **equity_kwargs)
 
     result_data = {}
 
@@ -201,6 +521,38 @@ def run_sensitivity_cli(args: argparse.Namespace) -> dict[str, Any]:
             "data": df.to_dict(orient="records")
         }
 
+    elif args.analysis_type == "adaptive":
+        var_name = args.variable
+        base_vals = {"terminal_growth": 0.03, "margin": 0.20, "growth": 0.10, "wacc": 0.08}
+        if var_name not in base_vals:
+            return {"error": f"Unknown variable: {var_name}"}
+        # 等高線の探索は1つの指標に対してのみ行う
+        if len(metrics) > 1:
+            return {"error": "Adaptive analysis supports a single metric; pass one value to --metrics"}
+        base_val = base_vals[var_name]
+
+        result = analyzer.adaptive_one_way_sensitivity(
+            variable_name=var_name,
+            min_value=base_val * (1 - args.range),
+            max_value=base_val * (1 + args.range),
+            base_value=base_val,
+            output_func=output_func,
+            model_update_func=lambda x: update_model_variable(model, var_name, x),
+            contour_levels=args.levels,
+            initial_steps=args.steps,
+            output_tol=args.tol,
+            max_evaluations=args.max_evals,
+        )
+
+        result_data = {
+            "analysis_type": "adaptive",
+            "variable": var_name,
+            "base_value": base_val,
+            "evaluations": len(result["samples"]),
+            "data": result["samples"].to_dict(orient="records"),
+            "contours": result["contours"].to_dict(orient="records"),
+        }
+
     elif args.analysis_type == "tornado":
         # トルネード分析用に主要変数を定義
         # ベース値 ± range% でテスト
@@ -241,6 +593,7 @@ def run_sensitivity_cli(args: argparse.Namespace) -> dict[str, Any]:
             "data": df.to_dict(orient="records")
         }
 
+    result_data["cache"] = analyzer.cache_info()
     return result_data
 
 
@@ -251,7 +604,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "--type", 
         dest="analysis_type", 
-        choices=["one_way", "tornado"], 
+        choices=["one_way", "tornado", "adaptive"], 
         default="tornado",
         help="Type of sensitivity analysis to perform"
     )
@@ -269,6 +622,27 @@ if __name__ == "__main__":
     parser.add_argument("--range", type=float, default=0.20, help="Sensitivity range (decimal, e.g. 0.20 for 20%)")
     parser.add_argument("--steps", type=int, default=5, help="Number of steps for one-way analysis")
 
+    # 出力指標の設定
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        default=["enterprise_value"],
+        choices=OUTPUT_METRICS,
+        help="Output metric(s); multiple metrics are evaluated together in a single pass",
+    )
+    parser.add_argument("--net_debt", type=float, default=0.0, help="Net Debt for equity metrics")
+    parser.add_argument("--shares", type=float, default=100.0, help="Shares outstanding (millions)")
+
+    # Adaptive用の設定
+    parser.add_argument("--levels", nargs="+", type=float, default=None, help="Output contour levels for adaptive analysis")
+    parser.add_argument("--max_evals", type=int, default=200, help="Maximum model evaluations for adaptive analysis")
+    parser.add_argument(
+        "--tol",
+        type=float,
+        default=None,
+        help="Curvature tolerance for adaptive analysis (0 disables; default: off with --levels, else 1%% of output range)",
+    )
+
     args = parser.parse_args()
 
     # 分析実行
@@ -0,0 +1,138 @@
+"""
+Adaptive sensitivity and memoization checks for SensitivityAnalyzer.
+Run with: uv run --link-mode=copy pytest test_sensitivity_analysis.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# dcf_model.py は隣の dcf_model ディレクトリにある前提
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dcf_model"))
+
+from dcf_model import DCFModel
+from sensitivity_analysis import SensitivityAnalyzer, get_output_metric, update_model_variable
+
+
+class _Curve:
+    """y = 1 / x の単純なモデル (等高線の正確な位置が既知)"""
+
+    def __init__(self):
+        self.x = 1.0
+
+    def set(self, x: float):
+        self.x = x
+
+    def output(self) -> float:
+        return 1 / self.x
+
+
+def _base_model() -> DCFModel:
+    model = DCFModel("Test Co")
+    model.set_historical_financials(
+        revenue=[800, 900, 1000],
+        ebitda=[160, 185, 210],
+        capex=[40, 45, 50],
+        nwc=[80, 90, 100],
+        years=[2021, 2022, 2023],
+    )
+    model.set_assumptions(
+        projection_years=5,
+        revenue_growth=[0.12, 0.11, 0.10, 0.09, 0.08],
+        ebitda_margin=[0.21, 0.22, 0.23, 0.24, 0.25],
+        terminal_growth=0.03,
+    )
+    model.calculate_wacc(0.04, 1.2, 0.06, 0.05, 0.4)
+    return model
+
+
+@pytest.mark.parametrize("level", [0.6, 1.0, 1.7])
+def test_adaptive_one_way_contour_matches_exact_crossing(level):
+    curve = _Curve()
+    analyzer = SensitivityAnalyzer(curve)
+    result = analyzer.adaptive_one_way_sensitivity(
+        "x", 0.5, 2.0, 1.0, curve.output, curve.set, contour_levels=[level]
+    )
+
+    contours = result["contours"]
+    assert list(contours["level"]) == [level]
+    assert contours["value"].iloc[0] == pytest.approx(1 / level, rel=1e-4)
+    assert curve.x == 1.0
+
+
+def test_adaptive_one_way_with_levels_only_refines_the_crossing():
+    curve = _Curve()
+    analyzer = SensitivityAnalyzer(curve)
+    result = analyzer.adaptive_one_way_sensitivity(
+        "x", 0.5, 2.0, 1.0, curve.output, curve.set, contour_levels=[1.7], initial_steps=5, max_depth=8
+    )
+
+    # 初期グリッド 5 点 + 等高線を含む区間の二分 8 回
+    assert len(result["samples"]) == 5 + 8
+
+
+def test_adaptive_one_way_respects_max_evaluations():
+    curve = _Curve()
+    analyzer = SensitivityAnalyzer(curve)
+    result = analyzer.adaptive_one_way_sensitivity(
+        "x", 0.5, 2.0, 1.0, curve.output, curve.set, output_tol=1e-9, max_evaluations=20
+    )
+    assert len(result["samples"]) <= 20
+
+
+def test_evaluate_counts_hits_and_misses():
+    model = _base_model()
+    analyzer = SensitivityAnalyzer(model)
+
+    def output():
+        return get_output_metric(model)
+
+    first = analyzer.evaluate(output)
+    assert analyzer.evaluate(output) == first
+    update_model_variable(model, "wacc", 0.12)
+    analyzer.evaluate(output)
+
+    assert analyzer.cache_info() == {"hits": 1, "misses": 2, "size": 2, "maxsize": 4096}
+
+    analyzer.cache_clear()
+    assert analyzer.cache_info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 4096}
+
+
+def test_evaluate_evicts_least_recently_used_state():
+    model = _base_model()
+    analyzer = SensitivityAnalyzer(model, cache_size=2)
+    calls = []
+
+    def output():
+        calls.append(model.wacc_components["wacc"])
+        return get_output_metric(model)
+
+    def evaluate_at(wacc: float):
+        update_model_variable(model, "wacc", wacc)
+        analyzer.evaluate(output)
+
+    evaluate_at(0.08)
+    evaluate_at(0.09)
+    evaluate_at(0.08)  # ヒットして 0.08 が最新になる
+    evaluate_at(0.10)  # 最も古い 0.09 が追い出される
+    evaluate_at(0.08)
+    evaluate_at(0.09)
+
+    assert calls == [0.08, 0.09, 0.10, 0.09]
+    assert analyzer.cache_info() == {"hits": 2, "misses": 4, "size": 2, "maxsize": 2}
+
+
+def test_evaluate_without_cache_always_recomputes():
+    model = _base_model()
+    analyzer = SensitivityAnalyzer(model, cache_size=0)
+    calls = []
+
+    def output():
+        calls.append(1)
+        return get_output_metric(model)
+
+    analyzer.evaluate(output)
+    analyzer.evaluate(output)
+    assert len(calls) == 2
+    assert analyzer.cache_info()["size"] == 0